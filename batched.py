@@ -0,0 +1,546 @@
+import argparse
+import time
+from random import Random
+from typing import List, NamedTuple, Tuple
+import numpy as np
+from network import Event
+from model import Proposers, Acceptors, MessageType
+from simulation import SimulationRun, SimulationResult
+from retry import FlatRetry, ExponentialBackoff
+from tracing import QUIET
+from config import RETRY_ON_REJECTED
+
+PREPARE, PROMISE, ACCEPT, ACCEPTED, REJECTED = (messageType.value for messageType in (MessageType.PREPARE, MessageType.PROMISE, MessageType.ACCEPT, MessageType.ACCEPTED, MessageType.REJECTED))
+# Tick of an empty event slot
+NEVER = np.iinfo(np.int64).max
+# Bit one of a 64-bit computer mask
+ONE = np.int64(1)
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    # Set bits of every mask, for numpy before 2.0, which has no bitwise_count. Masks never have
+    # the sign bit set (at most 63 computers), and the steps run on uint64, where they wrap safely.
+    bits = masks.astype(np.uint64)
+    bits = bits - ((bits >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    bits = (bits & np.uint64(0x3333333333333333)) + ((bits >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    bits = (bits + (bits >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((bits * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+popcount = np.bitwise_count if hasattr(np, 'bitwise_count') else _popcount
+
+class BatchedEvents(NamedTuple):
+    # The Events of every instance, as arrays over instances x event slots, in the order they were
+    # appended. Computers are numbered 0..noOfProposers-1 for P1.., then the acceptors after them.
+    # An unused slot has tick NEVER.
+    tick: np.ndarray
+    # Bitmasks over computers: which ones the event fails and which ones it recovers
+    failure: np.ndarray
+    recovery: np.ndarray
+    # Proposer number of the request, or -1, and the value proposed (0 for none)
+    request: np.ndarray
+    value: np.ndarray
+
+def eventsFromLists(eventLists: List[List[Event]], noOfProposers: int) -> BatchedEvents:
+    # Packs one list of Events per instance, e.g. the events of sweep Scenarios
+    width = max((len(events) for events in eventLists), default=0)
+    shape = (len(eventLists), width)
+    tick, failure, recovery = np.full(shape, NEVER, np.int64), np.zeros(shape, np.int64), np.zeros(shape, np.int64)
+    request, value = np.full(shape, -1, np.int64), np.zeros(shape, np.int64)
+    number = lambda computer: computer.id - 1 if isinstance(computer, Proposers) else noOfProposers + computer.id - 1
+    for instance, events in enumerate(eventLists):
+        for slot, event in enumerate(events):
+            tick[instance, slot] = event.tick
+            failure[instance, slot] = sum(1 << number(computer) for computer in event.failure or ())
+            recovery[instance, slot] = sum(1 << number(computer) for computer in event.recovery or ())
+            if event.request:
+                request[instance, slot] = event.request.id - 1
+                value[instance, slot] = event.proposedValue or 0
+    return BatchedEvents(tick, failure, recovery, request, value)
+
+def eventLists(events: BatchedEvents, instance: int, noOfProposers: int) -> List[Event]:
+    # The Events of one instance, to run it through the object engine
+    computers = lambda mask: [Proposers(number + 1) if number < noOfProposers else Acceptors(number - noOfProposers + 1)
+                              for number in range(64) if mask >> number & 1] or None
+    result = []
+    for slot in range(events.tick.shape[1]):
+        if events.tick[instance, slot] == NEVER:
+            continue
+        request = events.request[instance, slot]
+        result.append(Event(int(events.tick[instance, slot]), computers(int(events.failure[instance, slot])), computers(int(events.recovery[instance, slot])),
+                            Proposers(int(request) + 1) if request >= 0 else None, int(events.value[instance, slot]) if request >= 0 else None))
+    return result
+
+def randomEvents(noOfInstances: int, noOfProposers: int, tolerance: int, noOfFailures: int = 2, seed: int = 0) -> Tuple[BatchedEvents, int]:
+    # The schedules of sweep.randomScenario for noOfInstances instances at once, drawn from one
+    # numpy generator instead of one Random per instance; returns them with the run's maxDuration
+    rng = np.random.default_rng(seed)
+    noOfAcceptors = 2 * tolerance + 1
+    maxDuration = noOfAcceptors * 30
+    width = noOfProposers + 2 * noOfFailures
+    shape = (noOfInstances, width)
+    tick, failure, recovery = np.zeros(shape, np.int64), np.zeros(shape, np.int64), np.zeros(shape, np.int64)
+    request, value = np.full(shape, -1, np.int64), np.zeros(shape, np.int64)
+    request[:, :noOfProposers] = np.arange(noOfProposers)
+    value[:, :noOfProposers] = rng.integers(1, 100, (noOfInstances, noOfProposers))
+    tick[:, 1:noOfProposers] = rng.integers(1, maxDuration // 2, (noOfInstances, noOfProposers - 1))
+    for index in range(noOfFailures):
+        isProposer = rng.random(noOfInstances) < 0.5
+        number = np.where(isProposer, rng.integers(0, noOfProposers, noOfInstances), noOfProposers + rng.integers(0, noOfAcceptors, noOfInstances))
+        failed = rng.integers(1, maxDuration // 2, noOfInstances)
+        slot = noOfProposers + 2 * index
+        tick[:, slot], failure[:, slot] = failed, np.int64(1) << number
+        tick[:, slot + 1], recovery[:, slot + 1] = failed + rng.integers(1, maxDuration // 2, noOfInstances), np.int64(1) << number
+    return BatchedEvents(tick, failure, recovery, request, value), maxDuration
+
+class UniformStream:
+    # Stand-in for a Random that hands out the uniforms of one instance of a BatchedRun, one per
+    # call, so the object engine can draw the same retry delays the batch drew
+    def __init__(self, uniforms: np.ndarray) -> None:
+        self.uniforms = uniforms
+        self.drawn = 0
+
+    def random(self) -> float:
+        self.drawn += 1
+        return float(self.uniforms[self.drawn - 1])
+
+    def randrange(self, stop: int) -> int:
+        return int(self.random() * stop)
+
+    def randint(self, low: int, high: int) -> int:
+        return low + int(self.random() * (high - low + 1))
+
+class BatchedRun:
+    # The single-synod simulation of network.py and simulation.py for many independent instances
+    # in lock step. All instances share one shape (proposers, acceptors, maxDuration); each has
+    # its own schedule. Every tick applies one step of the object engine to all instances at
+    # once: pop one due event, fail and recover computers as bitmasks, then either propose or
+    # deliver the oldest message whose endpoints are both up, each message type's handler
+    # running as array updates over the instances that delivered one.
+    #
+    # What the handlers read is reduced to what they can observe: an acceptor's n, value and
+    # highest-n PROMISE record; a proposer's n, value, first proposed value, and the acceptors
+    # that sent it a PROMISE and an ACCEPTED for its current n, as bitmasks like quorum.Votes,
+    # with the first acceptor to vote ACCEPTED. Quorums are majorities. Per-computer state is kept
+    # flat, instance-major, so proposer p of instance i is entry i * noOfProposers + p. Messages
+    # carry no state, only their type and endpoints, and are read against live state when
+    # delivered, as in the object engine.
+    #
+    # Retry delays are drawn as in EventScheduler. Given seeds, instance i draws from Random(seed)
+    # exactly like SimulationRun(..., seed) and matches it result for result, at the price of one
+    # Python call per retry. Without, every instance draws from its own row of uniforms, all
+    # filled by one numpy generator; UniformStream replays a row in the object engine.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, maxSimulationDuration: int, events: BatchedEvents, seeds: List[int] = None, retryPolicy=None, retrySeed: int = 0) -> None:
+        if noOfProposers + noOfAcceptors > 63:
+            raise ValueError('at most 63 computers per instance')
+        self.noOfProposers = noOfProposers
+        self.noOfAcceptors = noOfAcceptors
+        self.majority = (noOfAcceptors // 2) + 1
+        self.maxDuration = maxSimulationDuration
+        self.retryPolicy = retryPolicy if retryPolicy is not None else FlatRetry()
+        self.retryOnRejected = RETRY_ON_REJECTED
+        self.events = events
+        instances = len(events.tick)
+        self.noOfInstances = instances
+        self.seeds = seeds
+        self.rngs = [None] * instances if seeds is not None else None
+        self.uniformGenerator = np.random.default_rng(retrySeed)
+        self.uniforms = self.uniformGenerator.random((instances, 8)) if seeds is None else None
+        self.drawn = np.zeros(instances, np.int64)
+        # The Proposers handed to the retry policy
+        self.requesters = [Proposers(id) for id in range(1, noOfProposers + 1)]
+
+        size = instances * noOfProposers
+        self.proposerN = np.zeros(size, np.int64)
+        self.proposerValue = np.zeros(size, np.int64)
+        self.proposedFirst = np.zeros(size, np.int64)
+        self.promisedBy = np.zeros(size, np.int64)
+        self.acceptedBy = np.zeros(size, np.int64)
+        self.firstAccepted = np.zeros(size, np.int64)
+        self.consensus = np.zeros(size, bool)
+        self.pending = np.zeros(size, np.int64)
+        self.retries = np.zeros(size, np.int64)
+        size = instances * noOfAcceptors
+        self.acceptorN = np.ones(size, np.int64)
+        self.acceptorValue = np.zeros(size, np.int64)
+        self.promisedN = np.zeros(size, np.int64)
+        self.promisedValue = np.zeros(size, np.int64)
+        self.failed = np.zeros(instances, np.int64)
+        self.proposalNumber = np.zeros(instances, np.int64)
+
+        # Pending events: one slot per event, emptied (tick NEVER) when it is popped and reused by retries
+        self.eventTick = events.tick.copy()
+        self.eventFailure = events.failure.copy()
+        self.eventRecovery = events.recovery.copy()
+        self.eventRequest = events.request.copy()
+        self.eventValue = events.value.copy()
+        self.eventSequence = np.broadcast_to(np.arange(events.tick.shape[1], dtype=np.int64), events.tick.shape).copy()
+        self.sequence = np.full(instances, events.tick.shape[1], np.int64)
+        self.nextEvent = self.eventTick.min(axis=1, initial=NEVER)
+        for proposer in range(noOfProposers):
+            self.pending[proposer::noOfProposers] = ((self.eventTick != NEVER) & (self.eventRequest == proposer)).sum(axis=1)
+
+        # In-flight messages per instance, in a ring of capacity slots in arrival order: message
+        # number k of instance i sits at i * capacity + k % capacity, head is the oldest one still
+        # in flight and tail the next number to hand out. A message is packed as its type plus
+        # source << 3 plus destination << 9, and 0 marks a free slot: messages between head and
+        # tail that are 0 were delivered past a parked head. ready is the oldest message with both
+        # endpoints up (tail if there is none); it only moves forward, except when a recovery may
+        # have unparked older ones.
+        self.capacity = 16
+        while self.capacity < 8 * (noOfProposers + 1) * noOfAcceptors:
+            self.capacity *= 2
+        self.messages = np.zeros(instances * self.capacity, np.int32)
+        self.head = np.zeros(instances, np.int64)
+        self.ready = np.zeros(instances, np.int64)
+        self.tail = np.zeros(instances, np.int64)
+        self.queued = np.zeros(instances, np.int64)
+
+        self.done = np.zeros(instances, bool)
+        self.ticks = np.full(instances, maxSimulationDuration, np.int64)
+        self.timedOut = np.ones(instances, bool)
+        self.deferred: List[Tuple[np.ndarray, np.ndarray]] = []
+        # Consensus reached, as arrays of (instance, proposer, proposed, accepted), one per tick
+        self.consensusLog: List[Tuple[np.ndarray, ...]] = []
+
+    def _reserve(self, instances: np.ndarray, count: int) -> None:
+        # Room for count more messages on the given instances, doubling every ring if one is short
+        if not (self.tail[instances] - self.head[instances] + count > self.capacity).any():
+            return
+        capacity = self.capacity
+        needed = int((self.tail - self.head).max()) + count
+        while capacity < needed:
+            capacity *= 2
+        # Unroll every ring so its head is at slot 0, then widen it
+        order = (self.head[:, None] + np.arange(self.capacity)) % self.capacity
+        rings = np.take_along_axis(self.messages.reshape(self.noOfInstances, self.capacity), order, axis=1)
+        self.messages = np.concatenate([rings, np.zeros((self.noOfInstances, capacity - self.capacity), np.int32)], axis=1).ravel()
+        self.capacity = capacity
+        self.tail -= self.head
+        self.ready -= self.head
+        self.head[:] = 0
+
+    def _send(self, instances: np.ndarray, messageType, source: np.ndarray, destination: np.ndarray) -> None:
+        # Queues one message on each of the given instances
+        if len(instances) == 0:
+            return
+        self._reserve(instances, 1)
+        number = self.tail[instances]
+        self.messages[instances * self.capacity + number % self.capacity] = messageType + (source << 3) + (destination << 9)
+        self.tail[instances] = number + 1
+        self.queued[instances] += 1
+        self._advance(instances[self.ready[instances] == number])
+
+    def _broadcast(self, instances: np.ndarray, messageType: int, proposer: np.ndarray) -> None:
+        # Queues a message from proposer to every acceptor, in acceptor order, on each instance
+        if len(instances) == 0:
+            return
+        self._reserve(instances, self.noOfAcceptors)
+        number = self.tail[instances]
+        slots = instances[:, None] * self.capacity + (number[:, None] + np.arange(self.noOfAcceptors)) % self.capacity
+        acceptors = self.noOfProposers + np.arange(self.noOfAcceptors)
+        self.messages[slots] = messageType + (proposer[:, None] << 3) + (acceptors << 9)
+        self.tail[instances] = number + self.noOfAcceptors
+        self.queued[instances] += self.noOfAcceptors
+        self._advance(instances[self.ready[instances] == number])
+
+    def _advance(self, instances: np.ndarray) -> None:
+        # Moves ready past delivered messages and parked ones
+        while len(instances):
+            ready = self.ready[instances]
+            message = self.messages[instances * self.capacity + ready % self.capacity]
+            endpoints = (ONE << ((message >> 3) & 63)) | (ONE << (message >> 9))
+            instances = instances[(ready < self.tail[instances]) & ((message == 0) | (endpoints & self.failed[instances] != 0))]
+            self.ready[instances] += 1
+
+    def _hasMajorityAccepted(self, proposers: np.ndarray) -> np.ndarray:
+        # Proposers.hasMajority(ACCEPTED), side effect included: the consensus flag is only
+        # updated once the current n has a vote
+        voters = self.acceptedBy[proposers]
+        voted = voters != 0
+        majority = popcount(voters) >= self.majority
+        self.consensus[proposers[voted]] = majority[voted]
+        return voted & majority
+
+    def _retry(self, proposers: np.ndarray) -> None:
+        # A new request by each proposer with its current value, held aside until the tick ends
+        self.pending[proposers] += 1
+        self.deferred.append((proposers, self.proposerValue[proposers]))
+
+    def _delays(self, proposers: np.ndarray, attempts: np.ndarray) -> np.ndarray:
+        policy = self.retryPolicy
+        instances, proposer = proposers // self.noOfProposers, proposers % self.noOfProposers
+        if self.rngs is not None:
+            delays = np.empty(len(proposers), np.int64)
+            for index, (instance, number, attempt) in enumerate(zip(instances.tolist(), proposer.tolist(), attempts.tolist())):
+                if self.rngs[instance] is None:
+                    self.rngs[instance] = Random(self.seeds[instance])
+                delays[index] = policy.delay(self.requesters[number], attempt, self.rngs[instance])
+            return delays
+        if isinstance(policy, FlatRetry):
+            draws, ranges = np.ones(len(proposers), bool), np.full(len(proposers), float(policy.maxDelay))
+        elif isinstance(policy, ExponentialBackoff):
+            draws = proposer + 1 != (policy.leader if policy.leader is not None else -1)
+            ranges = np.minimum(float(policy.cap), policy.base * 2.0 ** (attempts - 1)) + 1
+        else:
+            # Any other policy is asked one retry at a time, against the same uniforms
+            delays = np.empty(len(proposers), np.int64)
+            for index, (instance, number, attempt) in enumerate(zip(instances.tolist(), proposer.tolist(), attempts.tolist())):
+                stream = UniformStream(self.uniforms[instance])
+                stream.drawn = int(self.drawn[instance])
+                delays[index] = policy.delay(self.requesters[number], attempt, stream)
+                self.drawn[instance] = stream.drawn
+            return delays
+        if draws.any() and int(self.drawn[instances[draws]].max()) >= self.uniforms.shape[1]:
+            self.uniforms = np.concatenate([self.uniforms, self.uniformGenerator.random(self.uniforms.shape)], axis=1)
+        uniforms = self.uniforms[instances, np.minimum(self.drawn[instances], self.uniforms.shape[1] - 1)]
+        self.drawn[instances] += draws
+        return np.where(draws, np.floor(uniforms * ranges), 0).astype(np.int64)
+
+    def _resolveDeferred(self, tick: int) -> None:
+        # EventScheduler.resolveDeferred: every retry queued in this tick is scheduled from the next one
+        for proposers, value in self.deferred:
+            instances = proposers // self.noOfProposers
+            self.retries[proposers] += 1
+            due = tick + self._delays(proposers, self.retries[proposers])
+            free = self.eventTick[instances] == NEVER
+            if not free.any(axis=1).all():
+                self._growEvents()
+                free = self.eventTick[instances] == NEVER
+            slot = free.argmax(axis=1)
+            self.eventTick[instances, slot] = due
+            self.eventFailure[instances, slot] = 0
+            self.eventRecovery[instances, slot] = 0
+            self.eventRequest[instances, slot] = proposers % self.noOfProposers
+            self.eventValue[instances, slot] = value
+            self.eventSequence[instances, slot] = self.sequence[instances]
+            self.sequence[instances] += 1
+            self.nextEvent[instances] = np.minimum(self.nextEvent[instances], due)
+        self.deferred = []
+
+    def _growEvents(self) -> None:
+        width = self.eventTick.shape[1]
+        for name, fill in (('eventTick', NEVER), ('eventFailure', 0), ('eventRecovery', 0), ('eventRequest', -1), ('eventValue', 0), ('eventSequence', 0)):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.full((len(array), width), fill, np.int64)], axis=1))
+
+    def _popDue(self, tick: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # EventScheduler.popDue on every live instance. Applies the failures and recoveries of the
+        # events popped and returns the instances whose event is a request to propose, with the
+        # proposer and the value.
+        live = np.flatnonzero(self.nextEvent <= tick)
+        if len(live) == 0:
+            return live, live, live
+        # Among the events due, the one appended first
+        ticks = self.eventTick[live]
+        sequence = np.where(ticks == self.nextEvent[live, None], self.eventSequence[live], NEVER)
+        slot = sequence.argmin(axis=1)
+        ticks[np.arange(len(live)), slot] = NEVER
+        self.eventTick[live, slot] = NEVER
+        self.nextEvent[live] = ticks.min(axis=1)
+
+        failure, recovery = self.eventFailure[live, slot], self.eventRecovery[live, slot]
+        changed = (failure | recovery) != 0
+        if changed.any():
+            self.failed[live] = (self.failed[live] | failure) & ~recovery
+            # A recovery may unpark messages older than ready, a failure park the one at ready
+            recovered = live[recovery != 0]
+            self.ready[recovered] = self.head[recovered]
+            self._advance(live[changed])
+        request, value = self.eventRequest[live, slot], self.eventValue[live, slot]
+        requested = request >= 0
+        self.pending[live[requested] * self.noOfProposers + request[requested]] -= 1
+        proposing = requested & (value != 0)
+        return live[proposing], request[proposing], value[proposing]
+
+    def _propose(self, instances: np.ndarray, proposer: np.ndarray, value: np.ndarray) -> None:
+        proposers = instances * self.noOfProposers + proposer
+        self.proposalNumber[instances] += 1
+        self.proposerN[proposers] = self.proposalNumber[instances]
+        self.proposerValue[proposers] = value
+        first = self.proposedFirst[proposers]
+        self.proposedFirst[proposers] = np.where(first == 0, value, first)
+        # Votes are kept for the current n only, and a fresh n has none
+        self.promisedBy[proposers] = 0
+        self.acceptedBy[proposers] = 0
+        self._broadcast(instances, PREPARE, proposer)
+
+    def _deliver(self, instances: np.ndarray) -> None:
+        # Extracts the ready message of each instance, if there is one, and hands it to its handler
+        ready = self.ready[instances]
+        found = ready < self.tail[instances]
+        instances, ready = instances[found], ready[found]
+        if len(instances) == 0:
+            return
+        slots = instances * self.capacity + ready % self.capacity
+        messages = self.messages[slots]
+        self.messages[slots] = 0
+        self.queued[instances] -= 1
+        self._advance(instances)
+        # Move the head past everything already delivered
+        moving = instances[self.head[instances] == ready]
+        while len(moving):
+            self.head[moving] += 1
+            head = self.head[moving]
+            moving = moving[(head < self.tail[moving]) & (self.messages[moving * self.capacity + head % self.capacity] == 0)]
+
+        types, source, destination = messages & 7, (messages >> 3) & 63, messages >> 9
+        for messageType, handler in ((PREPARE, self._onPrepare), (PROMISE, self._onPromise), (ACCEPT, self._onAccept), (ACCEPTED, self._onAccepted), (REJECTED, self._onRejected)):
+            # Indices rather than a boolean mask: selecting by a scattered mask is several times slower
+            match = np.flatnonzero(types == messageType)
+            if len(match):
+                handler(instances[match], source[match], destination[match])
+
+    def _onPrepare(self, instances: np.ndarray, proposer: np.ndarray, acceptor: np.ndarray) -> None:
+        acceptors = instances * self.noOfAcceptors + acceptor - self.noOfProposers
+        n = self.proposerN[instances * self.noOfProposers + proposer]
+        promised = self.acceptorN[acceptors] <= n
+        self.acceptorN[acceptors[promised]] = n[promised]
+        self._send(instances, np.where(promised, PROMISE, REJECTED), acceptor, proposer)
+
+    def _onPromise(self, instances: np.ndarray, acceptor: np.ndarray, proposer: np.ndarray) -> None:
+        acceptors = instances * self.noOfAcceptors + acceptor - self.noOfProposers
+        proposers = instances * self.noOfProposers + proposer
+        n = self.acceptorN[acceptors]
+        match = np.flatnonzero(self.proposerN[proposers] == n)
+        instances, acceptors, proposers, proposer, n = instances[match], acceptors[match], proposers[match], proposer[match], n[match]
+        value = self.acceptorValue[acceptors]
+        self.proposerValue[proposers] = np.where(value != 0, value, self.proposerValue[proposers])
+        # The acceptor saves the PROMISE; the first record with the highest n is the one ACCEPT reads
+        higher = n > self.promisedN[acceptors]
+        self.promisedN[acceptors[higher]] = n[higher]
+        self.promisedValue[acceptors[higher]] = value[higher]
+        voters = self.promisedBy[proposers]
+        self.promisedBy[proposers] = voters | (ONE << (acceptors % self.noOfAcceptors))
+        reached = (popcount(voters) < self.majority) & (popcount(self.promisedBy[proposers]) >= self.majority)
+        self._broadcast(instances[reached], ACCEPT, proposer[reached])
+
+    def _onAccept(self, instances: np.ndarray, proposer: np.ndarray, acceptor: np.ndarray) -> None:
+        acceptors = instances * self.noOfAcceptors + acceptor - self.noOfProposers
+        proposers = instances * self.noOfProposers + proposer
+        accepted = self.promisedN[acceptors] <= self.proposerN[proposers]
+        promisedValue = self.promisedValue[acceptors]
+        value = np.where(promisedValue != 0, promisedValue, self.proposerValue[proposers])
+        self.acceptorValue[acceptors[accepted]] = value[accepted]
+        self._send(instances, np.where(accepted, ACCEPTED, REJECTED), acceptor, proposer)
+
+    def _onAccepted(self, instances: np.ndarray, acceptor: np.ndarray, proposer: np.ndarray) -> None:
+        acceptorIndex = acceptor - self.noOfProposers
+        proposers = instances * self.noOfProposers + proposer
+        proposerN, acceptorN = self.proposerN[proposers], self.acceptorN[instances * self.noOfAcceptors + acceptorIndex]
+
+        match = proposerN == acceptorN
+        current, voter = proposers[match], acceptorIndex[match]
+        already = self._hasMajorityAccepted(current)
+        voters = self.acceptedBy[current]
+        first = voters == 0
+        self.firstAccepted[current[first]] = voter[first]
+        self.acceptedBy[current] = voters | (ONE << voter)
+        current = current[~already]
+        current = current[self._hasMajorityAccepted(current)]
+        if len(current):
+            instance = current // self.noOfProposers
+            accepted = self.acceptorValue[instance * self.noOfAcceptors + self.firstAccepted[current]]
+            self.consensusLog.append((instance, current % self.noOfProposers, self.proposedFirst[current], accepted))
+
+        # The acceptor moved on to a higher n: try again, unless decided or already due to
+        behind = proposers[proposerN < acceptorN]
+        behind = behind[~self._hasMajorityAccepted(behind)]
+        self._retry(behind[self.pending[behind] == 0])
+
+    def _onRejected(self, instances: np.ndarray, acceptor: np.ndarray, proposer: np.ndarray) -> None:
+        if not self.retryOnRejected:
+            return
+        proposers = instances * self.noOfProposers + proposer
+        retry = ~self._hasMajorityAccepted(proposers)
+        retry &= self.proposerN[proposers] < self.acceptorN[instances * self.noOfAcceptors + acceptor - self.noOfProposers]
+        proposers = proposers[retry]
+        self._retry(proposers[self.pending[proposers] == 0])
+
+    def simulate(self) -> 'BatchedResult':
+        live = np.arange(self.noOfInstances)
+        for tick in range(self.maxDuration):
+            # Instances with nothing in flight and nothing scheduled stop here
+            finished = (self.queued[live] == 0) & (self.nextEvent[live] == NEVER)
+            if finished.any():
+                self.ticks[live[finished]] = tick
+                self.timedOut[live[finished]] = False
+                self.done[live[finished]] = True
+                live = live[~finished]
+                if len(live) == 0:
+                    break
+
+            instances, proposer, value = self._popDue(tick)
+            self._propose(instances, proposer, value)
+            if len(instances):
+                busy = np.zeros(self.noOfInstances, bool)
+                busy[instances] = True
+                self._deliver(live[~busy[live]])
+            else:
+                self._deliver(live)
+            self._resolveDeferred(tick + 1)
+        return self.getResult()
+
+    def getResult(self) -> 'BatchedResult':
+        noOfConsensus = np.zeros(self.noOfInstances, np.int64)
+        agreement = np.ones(self.noOfInstances, bool)
+        firstValue = np.zeros(self.noOfInstances, np.int64)
+        for instances, _, _, accepted in self.consensusLog:
+            unseen = noOfConsensus[instances] == 0
+            firstValue[instances[unseen]] = accepted[unseen]
+            agreement[instances] &= firstValue[instances] == accepted
+            noOfConsensus[instances] += 1
+        undecided = ((self.proposerValue != 0) & ~self.consensus).reshape(self.noOfInstances, self.noOfProposers).sum(axis=1)
+        return BatchedResult(self.ticks.copy(), self.timedOut.copy(), noOfConsensus, agreement, undecided)
+
+    def result(self, instance: int) -> SimulationResult:
+        # One instance's outcome, as SimulationRun.simulate() would have returned it
+        consensus = []
+        for instances, proposer, proposed, accepted in self.consensusLog:
+            for index in np.flatnonzero(instances == instance):
+                consensus.append((int(proposer[index]) + 1, int(proposed[index]), int(accepted[index])))
+        undecided = [number + 1 for number in range(self.noOfProposers) if self.proposerValue[instance * self.noOfProposers + number] and not self.consensus[instance * self.noOfProposers + number]]
+        return SimulationResult(consensus, undecided, int(self.ticks[instance]), bool(self.timedOut[instance]))
+
+    def simulationRun(self, instance: int) -> SimulationRun:
+        # The same instance set up for the object engine, drawing the same retry delays
+        simulation = SimulationRun(self.noOfProposers, self.noOfAcceptors, self.maxDuration, eventLists(self.events, instance, self.noOfProposers),
+                                   self.seeds[instance] if self.seeds is not None else None, retryPolicy=self.retryPolicy)
+        if self.seeds is None:
+            simulation.events.rng = UniformStream(self.uniforms[instance])
+        simulation.network.retryOnRejected = self.retryOnRejected
+        simulation.network.trace.level = QUIET
+        return simulation
+
+class BatchedResult(NamedTuple):
+    # Per instance: the tick it stopped at, whether it ran out of ticks, how many consensus it
+    # reached, whether they all agreed, and how many proposers never reached one
+    ticks: np.ndarray
+    timedOut: np.ndarray
+    noOfConsensus: np.ndarray
+    agreement: np.ndarray
+    undecided: np.ndarray
+
+def check(run: BatchedRun, samples: List[int]) -> List[int]:
+    # The sampled instances whose result differs from the object engine's
+    return [instance for instance in samples if run.result(instance) != run.simulationRun(instance).simulate()]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate many independent single-synod instances at once')
+    parser.add_argument('--instances', type=int, default=100000)
+    parser.add_argument('--proposers', type=int, default=2)
+    parser.add_argument('--tolerance', type=int, default=1)
+    parser.add_argument('--failures', type=int, default=2, help='failure/recovery pairs per instance')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', type=int, default=100, help='instances to compare against the object engine')
+    args = parser.parse_args()
+
+    events, maxDuration = randomEvents(args.instances, args.proposers, args.tolerance, args.failures, args.seed)
+    run = BatchedRun(args.proposers, 2 * args.tolerance + 1, maxDuration, events, retrySeed=args.seed)
+    start = time.perf_counter()
+    result = run.simulate()
+    elapsed = time.perf_counter() - start
+    print(f'{args.instances} instances in {elapsed:.3f}s: {args.instances / elapsed:.0f} instances/s')
+    print(f'  consensus {np.mean(result.noOfConsensus > 0):.1%}, violations {np.sum(~result.agreement)}, timeouts {np.sum(result.timedOut)}, '
+          f'ticks mean {result.ticks.mean():.1f} median {np.median(result.ticks):.0f} max {result.ticks.max()}')
+    samples = np.random.default_rng(args.seed).choice(args.instances, min(args.check, args.instances), replace=False).tolist()
+    mismatches = check(run, samples)
+    print(f'  {len(samples) - len(mismatches)}/{len(samples)} sampled instances match the object engine' + (f', not {mismatches[:10]}' if mismatches else ''))
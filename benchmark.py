@@ -0,0 +1,476 @@
+import io
+import os
+import tempfile
+import sys
+import time
+import tracemalloc
+from random import Random
+from network import Network, Event
+from simulation import SimulationRun
+from multipaxos import MultiPaxosRun
+from latency import ConcurrentRun, FixedLatency, UniformLatency, ParetoLatency
+from persistence import WriteAheadLog
+from explorer import ScheduleExplorer
+from fuzz import fuzz
+from sweep import randomScenario
+from retry import FlatRetry, ExponentialBackoff
+from metrics import Metrics
+from tracing import Trace, QUIET, DEBUG
+from replay import TraceReplay, recordRun
+from quorum import MajorityQuorum, FlexibleQuorum, GridQuorum, WeightedQuorum
+from lease import LeaseRun, readEvent
+import suite
+from scenario import ScenarioFile
+from model import DataBase, MessageType, Message, Record, Storage, Prepare, Promise, Accept, Proposers, Acceptors
+
+def _quietly(simulation: SimulationRun):
+    simulation.network.trace.level = QUIET
+    return simulation.simulate()
+
+def benchExtractMessage(noOfMessages: int = 100000, noOfAcceptors: int = 101, failedFraction: float = 0.5, seed: int = 0) -> None:
+    # Fill the queue with noOfMessages PREPAREs spread over noOfAcceptors, fail a fraction of the
+    # acceptors so most of the head of the queue is parked, then time every extraction.
+    rng = Random(seed)
+    network = Network(1, noOfAcceptors)
+    proposer = network.proposers[0]
+    for _ in range(noOfMessages):
+        network.QueueMessage(Prepare(proposer, rng.choice(network.acceptors)))
+    for acceptor in rng.sample(network.acceptors, int(noOfAcceptors * failedFraction)):
+        network.setFailed(acceptor, True)
+
+    extracted = 0
+    start = time.perf_counter()
+    checkpoint = start
+    print(f'ExtractMessage: {noOfMessages} queued, {int(noOfAcceptors * failedFraction)}/{noOfAcceptors} acceptors failed')
+    while network.ExtractMessage():
+        extracted += 1
+        if extracted % (noOfMessages // 10) == 0:
+            now = time.perf_counter()
+            print(f'  {extracted:>8} extracted, {1e6 * (now - checkpoint) / (noOfMessages // 10):.3f} us/extract')
+            checkpoint = now
+    elapsed = time.perf_counter() - start
+    print(f'  {extracted} extracted in {elapsed:.3f}s ({1e6 * elapsed / max(extracted, 1):.3f} us/extract), {len(network)} parked')
+
+def benchSparseRun(maxDuration: int = 1000000, noOfEvents: int = 300, noOfAcceptors: int = 3, seed: int = 0) -> None:
+    # A long simulation with a handful of proposals and acceptor failure/recovery pairs spread
+    # over maxDuration ticks. Run time should track the number of events, not the duration.
+    rng = Random(seed)
+    events = [Event(0, None, None, Proposers(1), 42)]
+    for tick in sorted(rng.sample(range(1, maxDuration), noOfEvents)):
+        acceptor = Acceptors(rng.randrange(noOfAcceptors) + 1)
+        if rng.random() < 0.5:
+            events.append(Event(tick, [acceptor], None, None, None))
+        else:
+            events.append(Event(tick, None, [acceptor], None, None))
+    simulation = SimulationRun(2, noOfAcceptors, maxDuration, events, seed)
+    start = time.perf_counter()
+    _quietly(simulation)
+    elapsed = time.perf_counter() - start
+    print(f'SimulationRun: {maxDuration} ticks, {noOfEvents} events in {elapsed:.3f}s')
+
+def benchStorageLookups(noOfRecords: int = 50000, noOfLookups: int = 100000) -> None:
+    # A long-lived acceptor holding noOfRecords PROMISE/ACCEPT records; lookups should not depend on it
+    proposer, acceptor = Proposers(1), Acceptors(1)
+    for n in range(noOfRecords):
+        acceptor.setN(n)
+        proposer.setN(n)
+        acceptor.saveMessage(Promise(acceptor, proposer) if n % 2 else Accept(proposer, acceptor))
+    start = time.perf_counter()
+    for _ in range(noOfLookups):
+        acceptor.getMaxNAndValue(MessageType.PROMISE)
+        acceptor.getLastAccept()
+    elapsed = time.perf_counter() - start
+    print(f'Storage lookups: {noOfRecords} records, {1e6 * elapsed / noOfLookups:.3f} us per getMaxNAndValue + getLastAccept')
+
+def benchMasterTable(noOfRecords: int = 1000000, maxRecords: int = None) -> None:
+    # Fill a master table with noOfRecords rows and dump it through the streaming select
+    proposer, acceptor = Proposers(1), Acceptors(1)
+    database = DataBase(maxRecords)
+    start = time.perf_counter()
+    for n in range(noOfRecords):
+        database.addRecord({'source': proposer, 'destination': acceptor, 'messageType': MessageType.ACCEPT, 'n': n, 'value': 42})
+    inserted = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        database.select(['source', 'destination', 'messageType', 'n', 'value'], devnull)
+    dumped = time.perf_counter()
+    size = sum(column.itemsize * len(column) for column in database.masterTable.columns.values())
+    print(f'MasterTable: {noOfRecords} rows inserted in {inserted - start:.3f}s, dumped in {dumped - inserted:.3f}s, {size / len(database.masterTable):.1f} bytes/row')
+
+class _DictMessage:
+    # The message layout before Message was slotted, kept for comparison
+    def __init__(self, src, dst, messageType) -> None:
+        self.source = src
+        self.destination = dst
+        self.type = messageType
+
+def _footprint(build, count: int) -> float:
+    # Traced bytes per item of a list of count built objects, taken while the list is alive
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(objects)
+
+def _measure(build, count: int) -> float:
+    # Bytes per object, less what the list holding them costs per item, measured the same way
+    return _footprint(build, count) - _footprint(lambda i: None, count)
+
+def benchMessageMemory(count: int = 1000000) -> None:
+    # Bytes per in-flight message and per stored record, dict-based layout vs slotted
+    proposer, acceptor = Proposers(1), Acceptors(1)
+    message = Prepare(proposer, acceptor)
+    results = {
+        'message (dict)': _measure(lambda i: _DictMessage(proposer, acceptor, MessageType.PREPARE), count),
+        'message (slots)': _measure(lambda i: Message(proposer, acceptor, MessageType.PREPARE), count),
+        'record (dict)': _measure(lambda i: {'destination': acceptor, 'messageType': MessageType.PREPARE, 'n': i, 'value': i, 'messageObj': message, 'source': proposer}, count),
+        'record (slots)': _measure(lambda i: Record(proposer, acceptor, MessageType.PREPARE, i, i, message), count),
+    }
+    print(f'Memory at {count} objects:')
+    for name, size in results.items():
+        print(f'  {name:<16} {size:.1f} bytes')
+
+def benchMultiPaxos(noOfCommands: int = 200, noOfAcceptors: int = 5) -> None:
+    # Messages and ticks per committed value: one Multi-Paxos log vs a single-synod run per value
+    events = [Event(tick, None, None, Proposers(1), tick + 1) for tick in range(noOfCommands)]
+    multi = MultiPaxosRun(1, noOfAcceptors, 100 * noOfCommands * noOfAcceptors, events)
+    result = _quietly(multi)
+    committed = len(multi.network.getLog())
+    print(f'Multi-Paxos:   {committed} committed, {multi.network.network.queued / committed:.1f} messages/value, {result.ticks / committed:.1f} ticks/value')
+
+    messages = ticks = 0
+    for value in range(1, noOfCommands + 1):
+        single = SimulationRun(1, noOfAcceptors, 100 * noOfAcceptors, [Event(0, None, None, Proposers(1), value)])
+        result = _quietly(single)
+        messages += single.network.network.queued
+        ticks += result.ticks
+    print(f'Single-synod:  {noOfCommands} committed, {messages / noOfCommands:.1f} messages/value, {ticks / noOfCommands:.1f} ticks/value')
+
+def benchBatching(noOfTicks: int = 200, commandsPerTick: int = 8, noOfAcceptors: int = 5) -> None:
+    # Throughput of one Multi-Paxos leader under a client load of commandsPerTick per tick,
+    # against batch size and pipelining window
+    print(f'Batching: {noOfTicks * commandsPerTick} commands, {commandsPerTick}/tick, {noOfAcceptors} acceptors')
+    print(f'  {"batch":>5} {"window":>6} {"committed":>9} {"ticks":>7} {"values/tick":>11} {"values/s":>10}')
+    for maxBatchSize in (1, 4, 16, 64):
+        for window in (1, 4, None):
+            events = [Event(tick, None, None, Proposers(1), list(range(tick * commandsPerTick, (tick + 1) * commandsPerTick))) for tick in range(noOfTicks)]
+            run = MultiPaxosRun(1, noOfAcceptors, 10 ** 7, events, maxBatchSize=maxBatchSize, maxBatchWait=2, window=window)
+            start = time.perf_counter()
+            result = _quietly(run)
+            elapsed = time.perf_counter() - start
+            committed = len(run.network.getLog())
+            print(f'  {maxBatchSize:>5} {str(window):>6} {committed:>9} {result.ticks:>7} {committed / result.ticks:>11.2f} {committed / elapsed:>10.0f}')
+
+def benchCommitLatency(acceptorCounts=(3, 5, 11, 25, 51), seeds: int = 20) -> None:
+    # Ticks for one proposer to reach consensus without failures, as the cluster grows:
+    # one delivery per tick against parallel delivery under several link latency models
+    models = {'fixed(1)': FixedLatency(1), 'uniform(1-5)': UniformLatency(1, 5), 'pareto(1,1.5)': ParetoLatency(1, 1.5, 50)}
+    print(f'Commit latency in ticks (mean over {seeds} seeds)')
+    print(f'  {"acceptors":>9} {"serial":>8}' + ''.join(f' {name:>14}' for name in models))
+    for noOfAcceptors in acceptorCounts:
+        events = lambda: [Event(0, None, None, Proposers(1), 42)]
+        serial = _quietly(SimulationRun(1, noOfAcceptors, 10 ** 6, events())).ticks
+        line = f'  {noOfAcceptors:>9} {serial:>8}'
+        for model in models.values():
+            ticks = [_quietly(ConcurrentRun(1, noOfAcceptors, 10 ** 6, events(), seed, model)).ticks for seed in range(seeds)]
+            line += f' {sum(ticks) / len(ticks):>14.1f}'
+        print(line)
+
+def benchWriteAheadLog(noOfRecords: int = 20000, batchSizes=(1, 8, 64, 512)) -> None:
+    # Durable commits per second on local disk against the number of records per fsync
+    proposer, acceptor = Proposers(1), Acceptors(1)
+    print(f'WriteAheadLog: {noOfRecords} records')
+    for groupCommit in batchSizes:
+        with tempfile.TemporaryDirectory() as directory:
+            log = WriteAheadLog(os.path.join(directory, 'A1.wal'), groupCommit)
+            count = noOfRecords if groupCommit > 1 else noOfRecords // 10
+            start = time.perf_counter()
+            for n in range(count):
+                log.append(Record(proposer, acceptor, MessageType.ACCEPT, n, 42, None))
+            log.close()
+            elapsed = time.perf_counter() - start
+            replayStart = time.perf_counter()
+            replayed = sum(1 for _ in log.replay())
+            replayElapsed = time.perf_counter() - replayStart
+            print(f'  batch {groupCommit:>4}: {count / elapsed:>10.0f} commits/s, {log.syncs} fsyncs, replay {replayed / replayElapsed:>10.0f} records/s')
+
+def benchSnapshots(noOfRecords: int = 100000, intervals=(None, 1000, 100)) -> None:
+    # Records held in memory and restart (WAL replay) time of a long-running acceptor against the snapshot interval
+    proposer = Proposers(1)
+    print(f'Snapshots: {noOfRecords} records')
+    for interval in intervals:
+        with tempfile.TemporaryDirectory() as directory:
+            log = WriteAheadLog(os.path.join(directory, 'A1.wal'))
+            storage = Storage(None, log, interval)
+            start = time.perf_counter()
+            for n in range(noOfRecords):
+                storage.addRecord(Record(proposer, None, MessageType.PROMISE if n % 2 else MessageType.ACCEPT, n, 42, None))
+            log.close()
+            elapsed = time.perf_counter() - start
+            replayStart = time.perf_counter()
+            replayed = sum(1 for _ in log.replay())
+            replayElapsed = time.perf_counter() - replayStart
+            print(f'  interval {str(interval):>5}: {noOfRecords / elapsed:>9.0f} records/s, {len(storage.getRecords()):>6} in memory, '
+                  f'{replayed:>6} replayed on restart in {1e3 * replayElapsed:.2f}ms, {log.snapshots} snapshots')
+
+def benchExplorer(noOfAcceptors: int = 3, maxFailures: int = 1) -> None:
+    # Exhaustive exploration of one proposer: distinct states and transitions per second
+    result = ScheduleExplorer(1, noOfAcceptors, None, maxFailures).explore()
+    print(f'Explorer: 1 proposer, {noOfAcceptors} acceptors, {maxFailures} failures: {result.states} states, {result.transitions} transitions '
+          f'in {result.elapsed:.2f}s ({result.states / result.elapsed:.0f} states/s), agreement {"violated" if result.violation else "holds"}')
+
+def benchFuzz(noOfSeeds: int = 1000) -> None:
+    # Seeded random schedules checked per second, across all cores
+    runs, elapsed, failures = fuzz(randomScenario(noOfProposers, 1, seed) for noOfProposers in (2, 3) for seed in range(noOfSeeds))
+    print(f'Fuzz: {runs} schedules in {elapsed:.2f}s ({runs / elapsed:.0f} schedules/s), '
+          f'{", ".join(f"{len(failing)} {kind}" for kind, failing in failures.items()) or "no failures"}')
+
+def benchRetryPolicies(proposerCounts=range(2, 17), noOfSeeds: int = 30, maxDuration: int = 5000) -> None:
+    # Ticks until dueling proposers settle, under each retry policy, as the proposer count grows.
+    # Every proposer proposes at a random tick of the first 3 ticks per proposer. A run settles at
+    # the tick of its first consensus, the end of the first accept phase the metrics time; the
+    # table shows the spread of that tick over the runs that reached one, the median tick the run
+    # ended at, runs that timed out, and how many proposers reached consensus on average.
+    print(f'Retry policies: {noOfSeeds} seeds per row')
+    for policy in (FlatRetry(), ExponentialBackoff(), ExponentialBackoff(leader=1)):
+        print(f'  {policy}')
+        print(f'  {"proposers":>9} {"p50":>6} {"p90":>6} {"max":>6} {"end p50":>7} {"timeouts":>8} {"decided":>7}')
+        for noOfProposers in proposerCounts:
+            settled, ended, timeouts, decided = [], [], 0, 0
+            for seed in range(noOfSeeds):
+                rng = Random(seed)
+                events = [Event(rng.randrange(3 * noOfProposers), None, None, Proposers(id), 10 * id) for id in range(1, noOfProposers + 1)]
+                simulation = SimulationRun(noOfProposers, 3, maxDuration, events, seed, retryPolicy=policy)
+                simulation.network.metrics = Metrics()
+                result = _quietly(simulation)
+                accepts = [phase['start'] + phase['ticks'] for phase in simulation.network.metrics.phases if phase['phase'] == 'accept']
+                if accepts:
+                    settled.append(min(accepts))
+                ended.append(result.ticks)
+                timeouts += result.timedOut
+                decided += len(result.consensusReached)
+            settled.sort()
+            ended.sort()
+            spread = f'{settled[len(settled) // 2]:>6} {settled[int(0.9 * len(settled))]:>6} {settled[-1]:>6}' if settled else f'{"-":>6} {"-":>6} {"-":>6}'
+            print(f'  {noOfProposers:>9} {spread} {ended[len(ended) // 2]:>7} {timeouts:>8} {decided / noOfSeeds:>7.1f}')
+
+def benchMetrics(noOfProposers: int = 8, noOfSeeds: int = 200) -> None:
+    # Cost of the instrumentation: dueling-proposer runs with no metrics attached and with
+    # metrics attached, then what the instrumented runs measured
+    timings = {}
+    for enabled in (False, True):
+        collected = Metrics() if enabled else None
+        start = time.perf_counter()
+        for seed in range(noOfSeeds):
+            rng = Random(seed)
+            events = [Event(rng.randrange(3 * noOfProposers), None, None, Proposers(id), 10 * id) for id in range(1, noOfProposers + 1)]
+            simulation = SimulationRun(noOfProposers, 3, 5000, events, seed)
+            simulation.network.metrics = collected
+            _quietly(simulation)
+        timings[enabled] = time.perf_counter() - start
+    print(f'Metrics: {noOfSeeds} runs of {noOfProposers} proposers, {timings[False]:.3f}s without, {timings[True]:.3f}s with '
+          f'({100 * (timings[True] / timings[False] - 1):+.1f}%)')
+    print(f'  {collected.counters}')
+    for name in ('prepare.ticks', 'accept.ticks', 'queueDepth'):
+        histogram = collected.histograms[name]
+        print(f'  {name}: count {histogram.count}, mean {histogram.total / histogram.count:.1f}, p50 <= {histogram.percentile(0.5)}, p99 <= {histogram.percentile(0.99)}, max {histogram.max}')
+
+def benchTrace(noOfProposers: int = 8, noOfSeeds: int = 200) -> None:
+    # The same dueling-proposer runs with the full trace written out one record at a time,
+    # with the full trace buffered, and with no trace
+    def run(trace: Trace) -> float:
+        start = time.perf_counter()
+        for seed in range(noOfSeeds):
+            rng = Random(seed)
+            events = [Event(rng.randrange(3 * noOfProposers), None, None, Proposers(id), 10 * id) for id in range(1, noOfProposers + 1)]
+            simulation = SimulationRun(noOfProposers, 3, 5000, events, seed)
+            simulation.network.trace = trace
+            simulation.simulate()
+        return time.perf_counter() - start
+
+    print(f'Trace: {noOfSeeds} runs of {noOfProposers} proposers')
+    with open(os.devnull, 'w') as devnull:
+        for name, trace in (('unbuffered', Trace(DEBUG, devnull, 0)), ('buffered', Trace(DEBUG, devnull)), ('quiet', Trace(QUIET))):
+            print(f'  {name:<10} {run(trace):.3f}s')
+
+def benchReplay(noOfProposers: int = 8, maxDuration: int = 200000, seed: int = 0) -> None:
+    # One long dueling-proposer run with acceptor failures: how big its binary trace is next to
+    # the text trace, and how fast it replays and seeks compared to simulating it again
+    rng = Random(seed)
+    events = [Event(rng.randrange(maxDuration // 2), None, None, Proposers(rng.randrange(noOfProposers) + 1), rng.randrange(1, 100)) for _ in range(20 * noOfProposers)]
+    for tick in rng.sample(range(1, maxDuration // 2), 50):
+        acceptor = Acceptors(rng.randrange(3) + 1)
+        events += [Event(tick, [acceptor], None, None, None), Event(tick + rng.randrange(1, 50), None, [acceptor], None, None)]
+
+    def simulation() -> SimulationRun:
+        return SimulationRun(noOfProposers, 3, maxDuration, [Event(event.tick, event.failure, event.recovery, event.request, event.proposedValue) for event in events], seed)
+
+    text = io.StringIO()
+    traced = simulation()
+    traced.network.trace = Trace(DEBUG, text)
+    traced.simulate()
+    binary = io.BytesIO()
+    recorded = simulation()
+    recorded.network.trace.level = QUIET
+    writer = recordRun(recorded, binary)
+    start = time.perf_counter()
+    recorded.simulate()
+    simulated = time.perf_counter() - start
+    data = binary.getvalue()
+
+    replay = TraceReplay(data)
+    start = time.perf_counter()
+    replay.run()
+    replayed = time.perf_counter() - start
+    assert [entry[1:] for entry in replay.network.consensusReached] == [entry[1:] for entry in recorded.network.consensusReached]
+    start = time.perf_counter()
+    for tick in range(maxDuration // 2, 0, -maxDuration // 20):
+        replay.seek(tick)
+    seeked = (time.perf_counter() - start) / 10
+    print(f'Replay: {writer.records} records, {len(data)} bytes binary ({len(data) / writer.records:.1f}/record) vs {len(text.getvalue())} bytes of text')
+    print(f'  simulate {simulated:.3f}s, replay {replayed:.3f}s, seek back {1e3 * seeked:.1f}ms with {len(replay.checkpoints)} checkpoints')
+
+def benchBatched(noOfInstances: int = 100000, noOfSamples: int = 1000, noOfProposers: int = 2, tolerance: int = 1, seed: int = 0) -> None:
+    # Many independent random synods through the batched engine, against the object engine's time
+    # for a sample of the same instances (run one by one, with the same retry delays)
+    try:
+        import batched
+    except ImportError:
+        print('Batched: numpy is not installed')
+        return
+    events, maxDuration = batched.randomEvents(noOfInstances, noOfProposers, tolerance, 2, seed)
+    run = batched.BatchedRun(noOfProposers, 2 * tolerance + 1, maxDuration, events, retrySeed=seed)
+    start = time.perf_counter()
+    run.simulate()
+    elapsed = time.perf_counter() - start
+    samples = range(0, noOfInstances, noOfInstances // noOfSamples)
+    simulations = [run.simulationRun(instance) for instance in samples]
+    start = time.perf_counter()
+    results = [simulation.simulate() for simulation in simulations]
+    perInstance = (time.perf_counter() - start) / len(simulations)
+    assert results == [run.result(instance) for instance in samples]
+    print(f'Batched: {noOfInstances} instances in {elapsed:.3f}s, object engine {1e3 * perInstance:.3f}ms per instance '
+          f'({perInstance * noOfInstances:.1f}s for all, {perInstance * noOfInstances / elapsed:.0f}x)')
+
+def benchQuorums(rows: int = 10, columns: int = 10, noOfProposers: int = 4, seeds: int = 5) -> None:
+    # Dueling proposers on rows x columns acceptors, delivering in parallel, under each quorum
+    # system: wall time, and how many ticks Phase 1 and Phase 2 took once started
+    noOfAcceptors = rows * columns
+    quorums = [MajorityQuorum(noOfAcceptors), FlexibleQuorum(noOfAcceptors, columns), GridQuorum(rows, columns),
+               WeightedQuorum({id: columns for id in range(1, columns + 1)}, noOfAcceptors)]
+    print(f'Quorums: {noOfProposers} proposers, {noOfAcceptors} acceptors, {seeds} seeds')
+    for quorum in quorums:
+        collected = Metrics()
+        start = time.perf_counter()
+        for seed in range(seeds):
+            events = [Event(id, None, None, Proposers(id), 10 * id) for id in range(1, noOfProposers + 1)]
+            simulation = ConcurrentRun(noOfProposers, noOfAcceptors, 10 ** 5, events, seed)
+            simulation.network.setQuorum(quorum)
+            simulation.network.metrics = collected
+            _quietly(simulation)
+        elapsed = time.perf_counter() - start
+        prepare, accept = collected.histograms['prepare.ticks'], collected.histograms['accept.ticks']
+        print(f'  {str(quorum):>16}: {elapsed:.3f}s, prepare mean {prepare.total / max(prepare.count, 1):.1f} ticks, accept mean {accept.total / max(accept.count, 1):.1f} ticks '
+              f'({accept.count} decided)')
+
+def benchLeases(noOfReads: int = 200, spacing: int = 20, noOfAcceptors: int = 3, leaseDuration: int = 100) -> None:
+    # Reads of the decided value, one every spacing ticks after P1 decides, served under a read
+    # lease against a full Paxos round per read: ticks per read and messages sent in all
+    reads = range(spacing, spacing * (noOfReads + 1), spacing)
+    collected = Metrics()
+    consensus = SimulationRun(1, noOfAcceptors, 10 ** 6, [Event(0, None, None, Proposers(1), 42)] + [Event(tick, None, None, Proposers(1), 42) for tick in reads])
+    consensus.network.metrics = collected
+    start = time.perf_counter()
+    _quietly(consensus)
+    elapsed = time.perf_counter() - start
+    rounds = {}
+    for phase in collected.phases:
+        rounds[phase['n']] = rounds.get(phase['n'], 0) + phase['ticks']
+    ticks = sorted(rounds[n] for n in rounds if n > 1)
+    sent = sum(value for name, value in collected.counters.items() if name.startswith('sent.'))
+    print(f'Reads: {noOfReads} reads every {spacing} ticks, {noOfAcceptors} acceptors')
+    print(f'  consensus: mean {sum(ticks) / len(ticks):.1f} ticks, max {ticks[-1]}, {sent} messages, {elapsed:.3f}s')
+
+    collected = Metrics()
+    leased = LeaseRun(1, noOfAcceptors, 10 ** 6, [Event(0, None, None, Proposers(1), 42)] + [readEvent(tick, Proposers(1)) for tick in reads], leaseDuration=leaseDuration)
+    leased.network.metrics = collected
+    start = time.perf_counter()
+    _quietly(leased)
+    elapsed = time.perf_counter() - start
+    assert len(leased.network.reads) == noOfReads and all(value == 42 for _, _, _, value in leased.network.reads)
+    histogram = collected.histograms['read.ticks']
+    sent = sum(value for name, value in collected.counters.items() if name.startswith('sent.'))
+    print(f'  lease({leaseDuration}): mean {histogram.total / histogram.count:.1f} ticks, max {histogram.max}, {sent} messages, {elapsed:.3f}s')
+
+def _scenarioRun(scenario: ScenarioFile, streamed: bool, seed: int = None) -> SimulationRun:
+    # The scenario streamed from its file, or all of its Events appended to the scheduler up front
+    simulation = SimulationRun(scenario.noOfProposers, scenario.noOfAcceptors, scenario.maxDuration, [], seed)
+    if streamed:
+        simulation.load(scenario)
+    else:
+        for event in list(scenario.events(simulation.network)):
+            simulation.events.append(event)
+    return simulation
+
+def benchScenarioFile(noOfEvents: int = 50000, noOfAcceptors: int = 3, seeds: int = 20) -> None:
+    # A scenario file of noOfEvents acceptor failures and recoveries: built into a list of Events
+    # up front against streamed from the file as the run goes, peak memory and run time. Every
+    # file in scenarios/ must end the same either way, seed for seed.
+    print(f'Scenario file: {noOfEvents} events, {noOfAcceptors} acceptors')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'scenario.jsonl')
+        with open(path, 'w') as file:
+            file.write(f'{{"proposers": 1, "acceptors": {noOfAcceptors}, "duration": {noOfEvents + 10}}}\n{{"tick": 0, "propose": "P1", "value": 42}}\n')
+            for tick in range(1, noOfEvents, 2):
+                file.write(f'{{"tick": {tick}, "fail": ["A{noOfAcceptors}"]}}\n{{"tick": {tick + 1}, "recover": ["A{noOfAcceptors}"]}}\n')
+        for streamed in (False, True):
+            scenario = ScenarioFile(path)
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = _quietly(_scenarioRun(scenario, streamed))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'  {"streamed" if streamed else "up front":>9}: {elapsed:.2f}s, peak {peak / 2 ** 10:.0f} KiB, consensus {result.consensusReached}')
+
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+    for name in sorted(os.listdir(directory)):
+        scenario = ScenarioFile(os.path.join(directory, name))
+        for seed in range(seeds) if scenario.seed is None else [scenario.seed]:
+            assert _quietly(_scenarioRun(scenario, False, seed)) == _quietly(_scenarioRun(scenario, True, seed)), (name, seed)
+    print(f'  scenarios/: {len(os.listdir(directory))} files end the same streamed or up front')
+
+def benchSuite(repeat: int = 5, budget: float = 0.1) -> None:
+    # The standard scenario families of suite.py at every scale; python suite.py --save/--baseline
+    # keeps a JSON baseline and checks against it
+    print('Suite:')
+    suite.printResults(suite.runSuite(repeat=repeat, budget=budget))
+
+BENCHMARKS = {
+    'extract': benchExtractMessage,
+    'sparse': benchSparseRun,
+    'storage': benchStorageLookups,
+    'mastertable': benchMasterTable,
+    'memory': benchMessageMemory,
+    'multipaxos': benchMultiPaxos,
+    'batching': benchBatching,
+    'latency': benchCommitLatency,
+    'wal': benchWriteAheadLog,
+    'snapshot': benchSnapshots,
+    'explorer': benchExplorer,
+    'fuzz': benchFuzz,
+    'retry': benchRetryPolicies,
+    'metrics': benchMetrics,
+    'trace': benchTrace,
+    'replay': benchReplay,
+    'batched': benchBatched,
+    'quorum': benchQuorums,
+    'lease': benchLeases,
+    'suite': benchSuite,
+    'scenario': benchScenarioFile,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
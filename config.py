@@ -6,5 +6,37 @@ NO_OF_ACCEPTORS = 2 * TOLERANCE + 1
 MAJORITY = (NO_OF_ACCEPTORS // 2) + 1
 MAX_DURATION = NO_OF_ACCEPTORS * 30
 
-CONSENSUS_REACHED = []
-EVENTS = []
\ No newline at end of file
+# Keep at most this many rows in the master table (None keeps everything)
+MASTER_TABLE_LIMIT = None
+
+# Multi-Paxos leaders pack up to BATCH_SIZE client commands into one slot, wait at most
+# BATCH_WAIT ticks for a batch to fill, and keep at most PIPELINE_WINDOW slots in flight (None: no limit)
+BATCH_SIZE = 1
+BATCH_WAIT = 0
+PIPELINE_WINDOW = None
+# A Multi-Paxos proposer stops following a leader that has not acknowledged commands it
+# forwarded within FORWARD_TIMEOUT ticks, and runs Phase 1 itself
+FORWARD_TIMEOUT = 50
+
+# Write-ahead logs of durable acceptors fsync after this many records, and at the end of every tick
+WAL_GROUP_COMMIT = 64
+
+# Compact every computer's records to a snapshot after this many new ones (None never compacts)
+SNAPSHOT_INTERVAL = None
+
+# A proposer that receives a REJECTED retries with a higher n
+RETRY_ON_REJECTED = True
+
+# Trace output: the level of detail (tracing.QUIET, ERROR, INFO or DEBUG, the full tick-by-tick
+# trace) and roughly how many characters to buffer before writing them out
+TRACE_LEVEL = 3
+TRACE_BUFFER = 1 << 16
+
+# A replay keeps a checkpoint of its state every this many ticks of the trace, to seek back to
+REPLAY_CHECKPOINT_INTERVAL = 1000
+
+# A proposer holding a read lease serves reads on its own for this many ticks after asking for it
+LEASE_DURATION = 100
+
+# suite.py flags a timing as a regression once it is this much slower than the baseline's
+BENCHMARK_THRESHOLD = 0.25
@@ -0,0 +1,399 @@
+import math
+import time
+import argparse
+from itertools import permutations
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Tuple
+from network import Network, Event, Peer, SAVED_BY_SENDER
+from model import Computers, Proposers, Acceptors, Message, MessageType, Propose
+from quorum import bit
+from config import NO_OF_PROPOSERS, NO_OF_ACCEPTORS, TOLERANCE
+
+# A transition is one of
+#   ('deliver', messageType, source, destination, n, value): extract such a message and deliver it
+#   ('fail', computer), ('recover', computer)
+#   ('propose', proposer): fire the proposer's first pending request
+# In-flight messages with the same type, endpoints, n and value are interchangeable and count as
+# one transition.
+
+class ExplorationResult(NamedTuple):
+    # Distinct (canonical) states reached, and transitions taken to reach them
+    states: int
+    transitions: int
+    # States left unexplored because they were maxDepth transitions deep
+    truncated: int
+    # Transitions leading from the initial state to a state that breaks agreement, or None
+    violation: List[Tuple]
+    elapsed: float
+    # False if the search stopped at maxStates before running out of states to explore
+    complete: bool
+
+class ExplorerNetwork(Network):
+    # The single-synod network with its output silenced. Queued messages go to a plain list the
+    # explorer picks from in any order, except REJECTEDs when they do not trigger retries:
+    # nothing acts on one then, so delivering it could never lead anywhere new.
+    # Messages carry their sender's n and value as of sending, as on the TCP transport: the
+    # source of a queued message is a Peer, and the sender saves its record as it sends. A
+    # delivery then reads and writes its destination only, so deliveries to different computers
+    # commute, which is what lets the explorer prune their orders.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int) -> None:
+        super().__init__(noOfProposers, noOfAcceptors)
+        self.inFlight: List[Message] = []
+
+    def __len__(self) -> int:
+        return len(self.inFlight)
+
+    def printMessage(self, computer: Computers, message: Message):
+        return
+
+    def QueueMessage(self, message: Message) -> None:
+        if isinstance(message.destination, Peer):
+            # A reply: addressed by the id the request came from
+            message.destination = self._local(message.destination)
+        if message.type in SAVED_BY_SENDER:
+            message.source.saveMessage(message)
+        if message.type != MessageType.REJECTED or self.retryOnRejected:
+            source = message.source
+            message.source = Peer(0 if isinstance(source, Proposers) else 1, source.id, source.getN(), source.getValue())
+            self.inFlight.append(message)
+
+class ScheduleExplorer:
+    # Model checker for the single-synod engine. Every proposer starts with one pending request;
+    # from there it enumerates every order in which messages can be extracted, computers can fail
+    # and recover and requests (including the retries the protocol queues) can fire, within the
+    # bounds, and checks agreement in every state it reaches.
+    # The engine itself runs the transitions: the explorer captures the mutable state of the
+    # computers, queue and scheduler and rolls them back between siblings.
+    # States are canonicalized before they are compared: proposal numbers are replaced by their
+    # rank, since the protocol only ever compares them, in-flight messages become a multiset, and
+    # acceptors and proposers are taken up to renaming; values are named after the proposer that
+    # first proposes them, since the protocol only ever compares them for equality too. A state
+    # seen before is not expanded again, and replies to rounds their proposer has moved past are
+    # dropped. Sleep sets prune orders of independent transitions, such as deliveries to two
+    # different computers, and persistent sets leave out whatever cannot interact with the
+    # transitions of a group of computers until they are done.
+    # Past a few proposers and acceptors the state space still grows beyond reach, so the search
+    # can be bounded by maxStates, and fuzz.py complements it.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, values: List[int] = None, maxFailures: int = 1, maxProposals: int = None, maxDepth: int = 200,
+                 maxStates: int = None, progress: int = None) -> None:
+        self.network = ExplorerNetwork(noOfProposers, noOfAcceptors)
+        # The proposer each value starts with, to name values in canonical states
+        self.owner: Dict[int, Proposers] = {}
+        for proposer, value in zip(self.network.proposers, values or [10 * (i + 1) for i in range(noOfProposers)]):
+            self.network.events.append(Event(None, None, None, proposer, value))
+            self.owner.setdefault(value, proposer)
+        self.maxFailures = maxFailures
+        # Requests fired in total, retries included; without a bound, retries never run out
+        self.maxProposals = maxProposals if maxProposals is not None else 2 * noOfProposers
+        self.maxDepth = maxDepth
+        # Stop after this many distinct states (None: explore them all), and print how far the
+        # search got every progress transitions (None: never)
+        self.maxStates = maxStates
+        self.progress = progress
+        self.proposalNumber = 0
+        self.failures = 0
+        self.proposals = 0
+        # Canonical state -> sleep set it was expanded with, named canonically
+        self.visited: Dict[str, FrozenSet[Tuple]] = {}
+        self.transitions = 0
+        self.truncated = 0
+
+    def _capture(self) -> Tuple:
+        # Storages are captured as they are: _apply copies one before it changes it
+        network = self.network
+        computers = tuple((computer.failed, computer.n, computer.value, computer.internalState) for computer in network.getComputers())
+        votes = tuple((proposer.consensus, proposer.promisedBy.copy(), proposer.acceptedBy.copy()) for proposer in network.proposers)
+        return (computers, votes, tuple(network.inFlight), list(network.consensusReached), list(network.events.deferred), dict(network.events.requests),
+                self.proposalNumber, self.failures, self.proposals)
+
+    def _restore(self, snapshot: Tuple) -> None:
+        network = self.network
+        computers, votes, messages, consensusReached, deferred, requests, self.proposalNumber, self.failures, self.proposals = snapshot
+        for computer, (failed, n, value, storage) in zip(network.getComputers(), computers):
+            computer.failed, computer.n, computer.value, computer.internalState = failed, n, value, storage
+        for proposer, (consensus, promisedBy, acceptedBy) in zip(network.proposers, votes):
+            proposer.consensus = consensus
+            proposer.promisedBy, proposer.acceptedBy = promisedBy.copy(), acceptedBy.copy()
+        network.inFlight = list(messages)
+        network.consensusReached = list(consensusReached)
+        network.events.deferred = list(deferred)
+        network.events.requests = dict(requests)
+
+    def _stale(self, message: Message) -> bool:
+        # A reply to a round its proposer has moved past: delivering it does nothing, and will
+        # not ever, since a proposer's n only grows
+        destination = message.destination
+        if not isinstance(destination, Proposers):
+            return False
+        if message.type == MessageType.REJECTED:
+            return message.source.n <= destination.n
+        return message.source.n < destination.n
+
+    def _canonical(self) -> Tuple[str, Callable[[Tuple], Tuple]]:
+        # Acceptors only ever talk to proposers, and neither the protocol nor agreement looks at
+        # which proposer or acceptor is which, so states that differ by a renaming of either are
+        # equivalent. For every order of the proposers, each acceptor is described without its
+        # id, by its own state, its in-flight messages and where it stands in the proposers'
+        # votes, and the descriptions are sorted; acceptors with equal descriptions are
+        # interchangeable. Of the encodings this gives, one per order of the proposers, the
+        # smallest is the canonical state: visited is keyed on it as a string, so states never
+        # collide. Also returns how to name a transition canonically in that state.
+        # Everything is encoded as numbers so the encodings compare as they are: None is -1 as
+        # a rank, and -1 (None) or -2 (-inf, no value) as a value.
+        network = self.network
+        messages = [(message, network._local(message.source)) for message in network.inFlight]
+        ns = {self.proposalNumber}
+        for computer in network.getComputers():
+            ns.add(computer.n)
+        promised = {acceptor: acceptor.getMaxNAndValue(MessageType.PROMISE) for acceptor in network.acceptors}
+        ns.update(n for n, _ in promised.values())
+        ns.update(message.source.n for message, _ in messages)
+        ns.discard(None)
+        rank = {n: index for index, n in enumerate(sorted(ns))}
+        rank[None] = -1
+        budget = self.proposals < self.maxProposals
+        unnamed = {None: -1, -math.inf: -2}
+        best = None
+        for order in permutations(network.proposers):
+            index = {proposer: position for position, proposer in enumerate(order)}
+            value = lambda v: index[self.owner[v]] if v in self.owner else unnamed[v]
+            described = {acceptor: [] for acceptor in network.acceptors}
+            for message, source in messages:
+                if isinstance(source, Acceptors):
+                    described[source].append((message.type.value, 1, index[message.destination], rank[message.source.n], value(message.source.value)))
+                else:
+                    described[message.destination].append((message.type.value, 0, index[source], rank[message.source.n], value(message.source.value)))
+            proposers = []
+            for proposer in order:
+                first = -1
+                for phase, votes in enumerate((proposer.promisedBy, proposer.acceptedBy)):
+                    voters = votes.get(proposer.n)
+                    for acceptor in network.acceptors:
+                        if voters & bit(acceptor):
+                            # Beyond who voted, only the first ACCEPTED voter is ever looked at
+                            isFirst = votes.first is not None and votes.first.id == acceptor.id
+                            described[acceptor].append((index[proposer], phase, isFirst))
+                            if phase == 1 and isFirst:
+                                first = value(votes.first.getValue())
+                proposed = proposer.internalState.getRecordsByMessageType(MessageType.PROPOSE)
+                # Requests left once the proposals have run out never fire
+                requests = tuple(value(event.proposedValue) for event in network.events.deferred if event.request is proposer and budget)
+                proposers.append((proposer.failed, rank[proposer.n], value(proposer.value), value(proposed[0].value) if proposed else -1, proposer.consensus, requests, first))
+            acceptors = {}
+            for acceptor in network.acceptors:
+                maxN, maxValue = promised[acceptor]
+                acceptors[acceptor] = (acceptor.failed, rank[acceptor.n], value(acceptor.value), rank[maxN], value(maxValue), tuple(sorted(described[acceptor])))
+            acceptorOrder = sorted(network.acceptors, key=acceptors.get)
+            consensus = sorted((index[proposer], value(proposed), value(accepted)) for proposer, proposed, accepted in network.consensusReached)
+            key = (tuple(acceptors[acceptor] for acceptor in acceptorOrder), tuple(proposers), tuple(consensus), rank[self.proposalNumber], self.failures, self.proposals)
+            if best is None or key < best[0]:
+                names = {acceptor: ('A', position) for position, acceptor in enumerate(acceptorOrder)}
+                names.update((proposer, ('P', position)) for proposer, position in index.items())
+                best = (key, names, value)
+        key, names, value = best
+        key = repr(key)
+
+        def rename(transition: Tuple) -> Tuple:
+            if transition[0] == 'deliver':
+                _, messageType, source, destination, n, v = transition
+                return ('deliver', messageType, names[source], names[destination], rank[n], value(v))
+            return (transition[0], names[transition[1]])
+        return key, rename
+
+    def _enabled(self) -> List[Tuple]:
+        network = self.network
+        transitions = []
+        for message in network.inFlight:
+            source = network._local(message.source)
+            if source.failed or message.destination.failed:
+                continue
+            transition = ('deliver', message.type, source, message.destination, message.source.n, message.source.value)
+            if transition not in transitions:
+                transitions.append(transition)
+        for computer in network.getComputers():
+            if computer.failed:
+                transitions.append(('recover', computer))
+            elif self.failures < self.maxFailures:
+                transitions.append(('fail', computer))
+        if self.proposals < self.maxProposals:
+            for proposer in network.proposers:
+                if not proposer.failed and network.events.hasPendingRequest(proposer):
+                    transitions.append(('propose', proposer))
+        return transitions
+
+    def _persistent(self, enabled: List[Tuple]) -> List[Tuple]:
+        # A persistent set: enabled transitions such that nothing done outside them, in any
+        # order, interacts with them, so exploring these alone reaches every terminal state. As
+        # a broken agreement stays broken, that is enough to find one. The set is the transitions
+        # of a group of computers, closed over whoever could yet send to one of them or, through
+        # proposals, share the proposal budget with one of them. While failures are left every
+        # computer may fail, and failures share their budget, so nothing is left out.
+        network = self.network
+        if self.failures < self.maxFailures:
+            return enabled
+        budget = self.proposals < self.maxProposals
+        computers = network.getComputers()
+        # Who could yet send to each computer. A proposer with no request pending and no message
+        # out or on its way back never sends again: only an answer can give it a retry.
+        senders = {computer: set() for computer in computers}
+        active = {proposer for proposer in network.proposers if network.events.hasPendingRequest(proposer)}
+        for message in network.inFlight:
+            source = network._local(message.source)
+            active.add(source if isinstance(source, Proposers) else message.destination)
+            if source.failed:
+                senders[message.destination].add(source)
+            if isinstance(source, Proposers):
+                # Acceptors only ever answer: they send to a proposer while it has requests out
+                senders[source].add(message.destination)
+        for proposer in network.proposers:
+            if ('propose', proposer) in enabled:
+                # Proposals share the budget and the order of n with every other proposer
+                senders[proposer].update(network.proposers)
+            if proposer in active and (budget or (proposer.n and not proposer.hasMajority(MessageType.PROMISE))):
+                # Proposers send to every acceptor when they propose and when they gather promises
+                for acceptor in network.acceptors:
+                    senders[acceptor].add(proposer)
+        best = enabled
+        for start in computers:
+            group = {start}
+            pending = [start]
+            while pending:
+                for sender in senders[pending.pop()]:
+                    if sender not in group:
+                        group.add(sender)
+                        pending.append(sender)
+            chosen = [transition for transition in enabled if (transition[3] if transition[0] == 'deliver' else transition[1]) in group]
+            if chosen and len(chosen) < len(best):
+                best = chosen
+        return best
+
+    def _apply(self, transition: Tuple) -> None:
+        network = self.network
+        kind = transition[0]
+        if kind == 'deliver':
+            _, messageType, source, destination, n, value = transition
+            index = next(index for index, message in enumerate(network.inFlight) if message.type == messageType and message.destination is destination
+                         and network._local(message.source) is source and message.source.n == n and message.source.value == value)
+            destination.internalState = destination.internalState.copy()
+            network.DeliverMessage(destination, network.inFlight.pop(index))
+        elif kind == 'fail':
+            network.setFailed(transition[1], True)
+            self.failures += 1
+        elif kind == 'recover':
+            network.setFailed(transition[1], False)
+        else:
+            proposer = transition[1]
+            event = network.events.popRequest(proposer)
+            self.proposals += 1
+            self.proposalNumber += 1
+            proposer.setN(self.proposalNumber)
+            proposer.setValue(event.proposedValue)
+            proposer.internalState = proposer.internalState.copy()
+            message = Propose(src=None, dst=proposer)
+            proposer.saveMessage(message)
+            network.DeliverMessage(proposer, message)
+
+    def _access(self, transition: Tuple) -> Tuple[FrozenSet, FrozenSet]:
+        # What a transition reads and writes. A delivery only reads and writes its receiver: the
+        # message carries what it needs of the sender, whose failure is accounted for below
+        kind = transition[0]
+        if kind == 'deliver':
+            destination = transition[3]
+            return frozenset((destination,)), frozenset((destination,))
+        if kind == 'fail':
+            return frozenset(('failures',)), frozenset((transition[1], 'failures'))
+        if kind == 'recover':
+            return frozenset(), frozenset((transition[1],))
+        return frozenset(('proposals',)), frozenset((transition[1], 'proposals'))
+
+    def _independent(self, first: Tuple, second: Tuple) -> bool:
+        firstReads, firstWrites = self._access(first)
+        secondReads, secondWrites = self._access(second)
+        # Failures and recoveries also enable or disable deliveries touching the computer
+        for transition, writes in ((first, secondWrites), (second, firstWrites)):
+            if transition[0] == 'deliver' and writes & {transition[2], transition[3]}:
+                return False
+        return not (firstWrites & (secondReads | secondWrites) or secondWrites & firstReads)
+
+    def _agreement(self) -> bool:
+        return len({accepted for _, _, accepted in self.network.consensusReached}) <= 1
+
+    def _enter(self, sleep: FrozenSet[Tuple], path: Tuple) -> List:
+        # A stack frame for the current state, or None if there is nothing new to explore from it
+        if len(path) >= self.maxDepth:
+            self.truncated += 1
+            return None
+        self.network.inFlight = [message for message in self.network.inFlight if not self._stale(message)]
+        key, rename = self._canonical()
+        enabled = self._enabled()
+        asleep = frozenset(rename(transition) for transition in sleep)
+        stored = self.visited.get(key)
+        if stored is None:
+            todo = [transition for transition in self._persistent(enabled) if transition not in sleep]
+            self.visited[key] = asleep
+        elif stored <= asleep:
+            return None
+        else:
+            # Only what the earlier visit had asleep and this one does not is left to explore:
+            # with what the earlier visit explored, that covers the persistent set minus this
+            # visit's sleep set
+            todo = [transition for transition in enabled if rename(transition) in stored and transition not in sleep]
+            self.visited[key] = stored & asleep
+        return [self._capture(), todo, sleep, [], path]
+
+    def explore(self) -> ExplorationResult:
+        # Depth-first search of every reachable state; stops at the first that breaks agreement
+        start = time.perf_counter()
+        stack = [self._enter(frozenset(), ())]
+        violation = None
+        while stack and violation is None:
+            if self.maxStates is not None and len(self.visited) >= self.maxStates:
+                break
+            snapshot, todo, sleep, done, path = stack[-1]
+            if not todo:
+                stack.pop()
+                continue
+            transition = todo.pop(0)
+            self._restore(snapshot)
+            self._apply(transition)
+            self.transitions += 1
+            if self.progress and self.transitions % self.progress == 0:
+                print(f'  {len(self.visited)} states, {self.transitions} transitions, depth {len(path) + 1}, {time.perf_counter() - start:.0f}s', flush=True)
+            childSleep = frozenset(other for other in sleep.union(done) if self._independent(other, transition))
+            done.append(transition)
+            if not self._agreement():
+                violation = list(path + (transition,))
+                break
+            child = self._enter(childSleep, path + (transition,))
+            if child is not None:
+                stack.append(child)
+        return ExplorationResult(len(self.visited), self.transitions, self.truncated, violation, time.perf_counter() - start, violation is not None or not stack)
+
+def describe(transition: Tuple) -> str:
+    if transition[0] == 'deliver':
+        _, messageType, source, destination, n, value = transition
+        return f'{source} -> {destination}\t{messageType.name}\tn={n} v={value}'
+    return f'{transition[0]} {transition[1]}'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Explore every schedule of a small single-synod configuration and check agreement')
+    parser.add_argument('--proposers', type=int, default=NO_OF_PROPOSERS)
+    parser.add_argument('--acceptors', type=int, default=NO_OF_ACCEPTORS)
+    parser.add_argument('--failures', type=int, default=TOLERANCE, help='failures allowed in one schedule')
+    parser.add_argument('--proposals', type=int, default=None, help='requests fired in one schedule, retries included')
+    parser.add_argument('--depth', type=int, default=200)
+    parser.add_argument('--max-states', type=int, default=1000000, help='stop after this many distinct states, 0 for no limit')
+    parser.add_argument('--progress', type=int, default=100000, help='report progress every this many transitions, 0 never')
+    args = parser.parse_args()
+
+    explorer = ScheduleExplorer(args.proposers, args.acceptors, None, args.failures, args.proposals, args.depth, args.max_states or None, args.progress or None)
+    result = explorer.explore()
+    print(f'{result.states} states, {result.transitions} transitions, {result.truncated} cut off at depth {args.depth}, '
+          f'{result.elapsed:.2f}s ({result.transitions / max(result.elapsed, 1e-9):.0f} transitions/s)')
+    if result.violation:
+        print('Agreement violated after:')
+        for transition in result.violation:
+            print(f'  {describe(transition)}')
+    elif not result.complete:
+        print(f'Agreement holds in every state reached, but the search stopped at {args.max_states} states and is not exhaustive')
+    else:
+        print('Agreement holds')
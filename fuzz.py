@@ -0,0 +1,131 @@
+import json
+import time
+import argparse
+from typing import Dict, List, Tuple
+from network import Event
+from simulation import SimulationResult
+from sweep import Scenario, randomScenario, runScenario, runSweep
+
+# What can go wrong in a run:
+#   agreement: two proposers reached consensus on different values
+#   validity:  a value nobody proposed was accepted
+#   livelock:  the run was still busy when it ran out of ticks, although nothing had failed,
+#              recovered or been requested during its second half
+AGREEMENT, VALIDITY, LIVELOCK = 'agreement', 'validity', 'livelock'
+
+def classify(scenario: Scenario, result: SimulationResult) -> str:
+    # The first invariant the run broke, or None
+    if not result.agreement():
+        return AGREEMENT
+    proposed = {event.proposedValue for event in scenario.events if event.request}
+    if any(accepted not in proposed for _, _, accepted in result.consensusReached):
+        return VALIDITY
+    if result.timedOut and all(event.tick < scenario.maxDuration // 2 for event in scenario.events):
+        return LIVELOCK
+    return None
+
+def _wellFormed(events: List[Event]) -> bool:
+    # Every computer that fails recovers later on, so a schedule cannot livelock just by
+    # leaving part of the system down for good
+    failed = set()
+    for event in sorted(events, key=lambda event: event.tick):
+        for computer in event.failure or ():
+            failed.add((type(computer), computer.id))
+        for computer in event.recovery or ():
+            failed.discard((type(computer), computer.id))
+    return not failed
+
+def shrink(scenario: Scenario, kind: str) -> Tuple[Scenario, int]:
+    # Smallest schedule found that still breaks the same invariant, and the number of runs it took.
+    # Drops ever smaller chunks of events while the failure persists (delta debugging), then
+    # moves every remaining event as early as it can go. The seed, and with it every retry
+    # delay drawn from it, stays the same.
+    runs = 0
+    def fails(events: List[Event]) -> bool:
+        nonlocal runs
+        if not events or not _wellFormed(events):
+            return False
+        runs += 1
+        candidate = scenario._replace(events=events)
+        return classify(*runScenario(candidate)) == kind
+
+    events = list(scenario.events)
+    chunk = max(len(events) // 2, 1)
+    while True:
+        index, removed = 0, False
+        while index < len(events):
+            candidate = events[:index] + events[index + chunk:]
+            if fails(candidate):
+                events, removed = candidate, True
+            else:
+                index += chunk
+        if not removed:
+            if chunk == 1:
+                break
+            chunk //= 2
+
+    moved = True
+    while moved:
+        moved = False
+        for index, event in enumerate(events):
+            for tick in sorted({0, event.tick // 2, event.tick - 1}):
+                if not 0 <= tick < event.tick:
+                    continue
+                candidate = list(events)
+                candidate[index] = Event(tick, event.failure, event.recovery, event.request, event.proposedValue)
+                if fails(candidate):
+                    events, moved = candidate, True
+                    break
+    return scenario._replace(events=sorted(events, key=lambda event: event.tick)), runs
+
+def formatEvent(event: Event) -> str:
+    # The event as a line of a scenario file (see scenario.py)
+    record = {'tick': event.tick}
+    if event.failure:
+        record['fail'] = [str(computer) for computer in event.failure]
+    if event.recovery:
+        record['recover'] = [str(computer) for computer in event.recovery]
+    if event.request:
+        record['propose'] = str(event.request)
+        record['value'] = event.proposedValue
+    return json.dumps(record)
+
+def fuzz(scenarios, workers: int = None) -> Tuple[int, float, Dict[str, List[Scenario]]]:
+    # Runs every scenario across the process pool; returns how many ran, how long it took and
+    # the scenarios that broke each invariant
+    failures: Dict[str, List[Scenario]] = {}
+    runs = 0
+    start = time.perf_counter()
+    for scenario, result in runSweep(scenarios, workers):
+        runs += 1
+        kind = classify(scenario, result)
+        if kind:
+            failures.setdefault(kind, []).append(scenario)
+    return runs, time.perf_counter() - start, failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fuzz the single-synod engine with seeded random schedules and shrink what fails')
+    parser.add_argument('--proposers', type=int, nargs='+', default=[2, 3])
+    parser.add_argument('--tolerance', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--failures', type=int, default=2, help='failure/recovery pairs per schedule')
+    parser.add_argument('--seeds', type=int, default=1000, help='schedules per configuration')
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shrink', type=int, default=1, help='failing schedules to shrink per invariant')
+    args = parser.parse_args()
+
+    scenarios = (randomScenario(noOfProposers, tolerance, seed, args.failures)
+                 for noOfProposers in args.proposers
+                 for tolerance in args.tolerance
+                 for seed in range(args.first_seed, args.first_seed + args.seeds))
+    runs, elapsed, failures = fuzz(scenarios, args.workers)
+    print(f'{runs} schedules in {elapsed:.2f}s: {runs / elapsed:.0f} schedules/s')
+    for kind, failing in failures.items():
+        print(f'{kind}: {len(failing)} schedules, e.g. seeds {[scenario.seed for scenario in failing[:10]]}')
+        for scenario in failing[:args.shrink]:
+            shrunk, shrinkRuns = shrink(scenario, kind)
+            print(f'  seed {scenario.seed}: {len(scenario.events)} events shrunk to {len(shrunk.events)} in {shrinkRuns} runs')
+            # As a scenario file, for python main.py
+            print(f'    {json.dumps({"proposers": scenario.noOfProposers, "acceptors": scenario.noOfAcceptors, "duration": scenario.maxDuration, "seed": scenario.seed})}')
+            for event in shrunk.events:
+                print(f'    {formatEvent(event)}')
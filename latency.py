@@ -0,0 +1,117 @@
+import heapq
+from itertools import count
+from typing import Dict, List, Set, Tuple
+from network import Network, MessageQueue, Event
+from model import Computers, Message, DataBase
+from scheduler import EventScheduler
+from simulation import SimulationRun
+
+class FixedLatency:
+    # Every message takes the same number of ticks
+    def __init__(self, ticks: int = 1) -> None:
+        self.ticks = ticks
+
+    def sample(self, rng) -> int:
+        return self.ticks
+
+class UniformLatency:
+    # Anywhere from low to high ticks, inclusive
+    def __init__(self, low: int = 1, high: int = 3) -> None:
+        self.low = low
+        self.high = high
+
+    def sample(self, rng) -> int:
+        return rng.randint(self.low, self.high)
+
+class ParetoLatency:
+    # Heavy-tailed: usually close to scale, now and then far more, up to cap ticks
+    def __init__(self, scale: int = 1, alpha: float = 1.5, cap: int = 100) -> None:
+        self.scale = scale
+        self.alpha = alpha
+        self.cap = cap
+
+    def sample(self, rng) -> int:
+        return min(int(self.scale * rng.paretovariate(self.alpha)), self.cap)
+
+class ConcurrentNetwork(Network):
+    # Every alive computer handles one message per tick, all in parallel, and every message spends
+    # a number of ticks in transit drawn from the latency model of its link. A message queued at
+    # tick t arrives at t + latency (at least t + 1) and then waits in its destination's own queue,
+    # where messages touching a failed computer are parked exactly as in the shared queue.
+    # Latencies are drawn from the simulation's seeded RNG.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, events: EventScheduler = None, database: DataBase = None) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, events, database)
+        self.rng = self.events.rng
+        self.latency = FixedLatency(1)
+        self.linkLatency: Dict[Tuple[Computers, Computers], object] = {}
+        self.sequence = count()
+        self.inTransit: List[Tuple[int, int, Message]] = []
+        self.arrived: Dict[Computers, MessageQueue] = {computer: MessageQueue() for computer in self.getComputers()}
+        self.queued = 0
+
+    def __len__(self) -> int:
+        return len(self.inTransit) + sum(len(queue) for queue in self.arrived.values())
+
+    def setLatency(self, model, source: Computers = None, destination: Computers = None) -> None:
+        # The default model for every link, or the model of the one link from source to destination
+        if source is None and destination is None:
+            self.latency = model
+        else:
+            self.linkLatency[(source, destination)] = model
+
+    def QueueMessage(self, message: Message) -> None:
+        model = self.linkLatency.get((message.source, message.destination), self.latency)
+        arrival = self.currentTick + max(1, model.sample(self.rng))
+        heapq.heappush(self.inTransit, (arrival, next(self.sequence), message))
+        self.queued += 1
+        if self.metrics is not None:
+            self.metrics.count(f'sent.{message.type.name}')
+
+    def onTick(self, tick: int) -> None:
+        super().onTick(tick)
+        while self.inTransit and self.inTransit[0][0] <= tick:
+            _, _, message = heapq.heappop(self.inTransit)
+            self.arrived[message.destination].append(message)
+
+    def nextWakeup(self) -> int:
+        upcoming = [t for t in (super().nextWakeup(), self.inTransit[0][0] if self.inTransit else None) if t is not None]
+        return min(upcoming) if upcoming else None
+
+    def setFailed(self, computer: Computers, failed: bool) -> None:
+        if computer.failed == failed:
+            return
+        super().setFailed(computer, failed)
+        for queue in self.arrived.values():
+            if failed:
+                queue.fail(computer)
+            else:
+                queue.recover(computer)
+
+    def ExtractMessage(self) -> Message:
+        # A deliverable message for the first computer that has one
+        for computer in self.getComputers():
+            message = self.arrived[computer].popDeliverable()
+            if message:
+                return message
+        return None
+
+    def ExtractMessages(self, busy: Set[Computers]) -> List[Message]:
+        # One deliverable message for every computer that has not worked yet in this tick
+        messages = []
+        for computer in self.getComputers():
+            if computer not in busy:
+                message = self.arrived[computer].popDeliverable()
+                if message:
+                    messages.append(message)
+        return messages
+
+    def hasDeliverableMessage(self) -> bool:
+        return any(queue.hasDeliverable() for queue in self.arrived.values())
+
+class ConcurrentRun(SimulationRun):
+    NETWORK = ConcurrentNetwork
+
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, maxSimulationDuration: int, eventsList: List[Event], seed: int = None, latency=None) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, maxSimulationDuration, eventsList, seed)
+        if latency is not None:
+            self.network.setLatency(latency)
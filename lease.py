@@ -0,0 +1,224 @@
+import heapq
+from collections import deque
+from enum import Enum
+from itertools import count
+from typing import Deque, Dict, List, Tuple
+from network import Network, Event
+from model import Computers, Proposers, Acceptors, Message, MessageType, DataBase
+from quorum import Votes
+from scheduler import EventScheduler
+from simulation import SimulationRun
+from tracing import ERROR, DEBUG
+from config import NO_OF_PROPOSERS, NO_OF_ACCEPTORS, LEASE_DURATION
+
+# The value of a request Event that asks its proposer for the decided value instead of proposing one
+READ = 'read'
+
+def readEvent(tick: int, proposer: Proposers) -> Event:
+    return Event(tick, None, None, proposer, READ)
+
+class LeaseMessageType(Enum):
+    READ = 1
+    LEASE = 2
+    GRANTED = 3
+
+class LeaseMessage(Message):
+    # READ comes from a client and, like PROPOSE, bypasses the network. LEASE asks an acceptor for
+    # a lease that runs out at expiry as far as the proposer is concerned; GRANTED answers it with
+    # the same expiry, so the proposer can tell the grants of its latest request from older ones.
+    __slots__ = ('expiry',)
+
+    def __init__(self, src: Computers, dst: Computers, messageType: LeaseMessageType, expiry: int = None) -> None:
+        super().__init__(src, dst, messageType)
+        self.expiry = expiry
+
+    def __str__(self) -> str:
+        result = f'{self.type.name.ljust(10, " ")} '
+        if self.expiry is not None:
+            result += f'until={self.expiry} '
+        return result
+
+class LeaseState:
+    # What one Proposer knows about its own lease
+    def __init__(self) -> None:
+        # Tick at which the lease it holds runs out, None if it holds none
+        self.expiry = None
+        # Expiry asked for by its latest request, and the acceptors that granted it
+        self.requested = None
+        self.grants = Votes()
+        # Arrival ticks of the reads waiting for a lease
+        self.reads: Deque[int] = deque()
+
+class LeaseNetwork(Network):
+    # Leader read leases on top of the single-synod engine. A proposer that has reached consensus
+    # asks every acceptor for a lease of leaseDuration ticks, counted from when it asks. An acceptor
+    # grants it unless it has promised a higher n since, or a lease it granted another proposer is
+    # still running, and counts its own leaseDuration from when it grants, so the acceptor's view of
+    # the lease always outlasts the proposer's. Until then the acceptor holds back every PREPARE and
+    # ACCEPT from other proposers. Once a Phase-2 quorum has granted, every Phase-1 quorum includes
+    # one of them, so no other proposer can get anything chosen, and the holder answers reads from
+    # the value it decided without sending a single message. Reads that find no lease wait for one,
+    # and for consensus first if need be; under steady reads the lease is renewed once half of it
+    # is gone. A proposer forgets its lease when it fails, and asks again once it is back.
+    # Lease messages are not recorded by a replay.TraceWriter.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, events: EventScheduler = None, database: DataBase = None) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, events, database)
+        self.leaseDuration = LEASE_DURATION
+        self.leases: Dict[Proposers, LeaseState] = {proposer: LeaseState() for proposer in self.proposers}
+        # The value each proposer has seen decided
+        self.decided: Dict[Proposers, int] = {}
+        # The proposer each acceptor granted its latest lease to, and when it runs out there
+        self.granted: Dict[Acceptors, Tuple[Proposers, int]] = {}
+        # PREPAREs and ACCEPTs held back by a lease, as (tick the lease runs out, arrival order, message)
+        self.heldBack: List[Tuple[int, int, Message]] = []
+        self.sequence = count()
+        # Every read served, as (proposer, arrival tick, tick served, value)
+        self.reads: List[Tuple[Proposers, int, int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.network) + len(self.heldBack)
+
+    def hasLease(self, proposer: Proposers) -> bool:
+        expiry = self.leases[proposer].expiry
+        return expiry is not None and self.currentTick < expiry and not proposer.failed and proposer.hasMajority()
+
+    def _mayRequest(self, proposer: Proposers) -> bool:
+        # A proposer with reads waiting, consensus reached and no lease asks for one, unless its
+        # last request may still be answered
+        state = self.leases[proposer]
+        requested = state.requested is not None and self.currentTick < state.requested
+        return bool(state.reads) and not proposer.failed and proposer in self.decided and not self.hasLease(proposer) and not requested
+
+    def onTick(self, tick: int) -> None:
+        super().onTick(tick)
+        while self.heldBack and self.heldBack[0][0] <= tick:
+            _, _, message = heapq.heappop(self.heldBack)
+            self.network.append(message)
+        for proposer in self.proposers:
+            if self._mayRequest(proposer):
+                self._requestLease(proposer)
+
+    def nextWakeup(self) -> int:
+        # When held back messages are let go, or a proposer with reads waiting may ask for a lease
+        upcoming = [self.heldBack[0][0]] if self.heldBack else []
+        for proposer, state in self.leases.items():
+            if state.reads and not proposer.failed and proposer in self.decided and not self.hasLease(proposer):
+                upcoming.append(self.currentTick + 1 if self._mayRequest(proposer) else state.requested)
+        return min(upcoming) if upcoming else None
+
+    def setFailed(self, computer: Computers, failed: bool) -> None:
+        if computer.failed == failed:
+            return
+        super().setFailed(computer, failed)
+        if failed and computer in self.leases:
+            state = self.leases[computer]
+            state.expiry = None
+            state.requested = None
+
+    def _requestLease(self, proposer: Proposers) -> None:
+        state = self.leases[proposer]
+        state.requested = self.currentTick + self.leaseDuration
+        for acceptor in self.acceptors:
+            self.QueueMessage(LeaseMessage(proposer, acceptor, LeaseMessageType.LEASE, state.requested))
+
+    def _serve(self, proposer: Proposers) -> None:
+        state = self.leases[proposer]
+        while state.reads:
+            arrival = state.reads.popleft()
+            self.reads.append((proposer, arrival, self.currentTick, self.decided[proposer]))
+            if self.metrics is not None:
+                self.metrics.observe('read.ticks', self.currentTick - arrival)
+        if 2 * (state.expiry - self.currentTick) < self.leaseDuration and (state.requested is None or state.requested <= state.expiry):
+            self._requestLease(proposer)
+
+    def _holdsBack(self, computer: Computers, message: Message) -> bool:
+        if message.type not in (MessageType.PREPARE, MessageType.ACCEPT):
+            return False
+        holder, expiry = self.granted.get(computer, (None, None))
+        if holder is None or holder is message.source or expiry <= self.currentTick:
+            return False
+        heapq.heappush(self.heldBack, (expiry, next(self.sequence), message))
+        if self.metrics is not None:
+            self.metrics.count(f'held.{message.type.name}')
+        self.trace.log(DEBUG, '{} -> {}\t{}held for the lease of {} until {}', message.source, message.destination, message, holder, expiry)
+        return True
+
+    def DeliverMessage(self, computer: Computers, message: Message) -> None:
+        if not isinstance(message, LeaseMessage):
+            if self._holdsBack(computer, message):
+                return
+            decided = len(self.consensusReached)
+            super().DeliverMessage(computer, message)
+            if len(self.consensusReached) > decided:
+                self.decided[computer] = self.consensusReached[-1][2]
+            return
+
+        try:
+            if message.type == LeaseMessageType.READ:
+                self.leases[computer].reads.append(self.currentTick)
+                if self.hasLease(computer):
+                    self._serve(computer)
+                return
+
+            if message.type == LeaseMessageType.LEASE:
+                holder, expiry = self.granted.get(computer, (None, None))
+                if holder is not None and holder is not message.source and expiry > self.currentTick:
+                    if self.metrics is not None:
+                        self.metrics.count('dropped.LEASE')
+                    return
+                if computer.getN() > message.source.getN():
+                    # Promised a higher n since: whatever the proposer decided may not hold for long
+                    if self.metrics is not None:
+                        self.metrics.count('dropped.LEASE')
+                    return
+                self.granted[computer] = (message.source, self.currentTick + self.leaseDuration)
+                self.QueueMessage(LeaseMessage(computer, message.source, LeaseMessageType.GRANTED, message.expiry))
+                return
+
+            if message.type == LeaseMessageType.GRANTED:
+                state = self.leases[computer]
+                if message.expiry != state.requested:
+                    return
+                state.grants.add(message.expiry, message.source)
+                if computer.quorum.isPhase2Quorum(state.grants.get(message.expiry)) and (state.expiry is None or state.expiry < message.expiry):
+                    state.expiry = message.expiry
+                    if self.hasLease(computer):
+                        self._serve(computer)
+                return
+
+        except Exception as ex:
+            self.trace.log(ERROR, 'Exception: {}', ex, end=' | ')
+        finally:
+            if self.metrics is not None:
+                self.metrics.count(f'delivered.{message.type.name}')
+            self.printMessage(computer, message)
+
+class LeaseRun(SimulationRun):
+    # Request events with the value READ ask the proposer for the decided value (see readEvent)
+    NETWORK = LeaseNetwork
+
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, maxSimulationDuration: int, eventsList: List[Event], seed: int = None, leaseDuration: int = LEASE_DURATION) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, maxSimulationDuration, eventsList, seed)
+        self.network.leaseDuration = leaseDuration
+
+    def _propose(self, proposer: Proposers, value: int) -> None:
+        if value != READ:
+            super()._propose(proposer, value)
+            return
+        # READ messages bypass the network and are delivered directly to the specified Proposer
+        self.network.DeliverMessage(proposer, LeaseMessage(None, proposer, LeaseMessageType.READ))
+
+if __name__ == '__main__':
+    # P1 decides 42 and takes reads under a lease; it fails while holding one, the reads that come
+    # in meanwhile wait, and once it is back it asks for a new lease and answers them
+    events = [Event(0, None, None, Proposers(1), 42)]
+    events += [readEvent(tick, Proposers(1)) for tick in range(20, 200, 10)]
+    events.append(Event(60, [Proposers(1)], None, None, None))
+    events.append(Event(90, None, [Proposers(1)], None, None))
+
+    run = LeaseRun(NO_OF_PROPOSERS, NO_OF_ACCEPTORS, 400, events, leaseDuration=50)
+    result = run.simulate()
+    print()
+    for proposer, arrival, served, value in run.network.reads:
+        print(f'{proposer} read at {arrival}, served at {served}: {value}')
+    print(f'Consensus: {result.consensusReached}, Messages: {run.network.network.queued}, Ticks: {result.ticks}')
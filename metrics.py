@@ -0,0 +1,97 @@
+import csv
+import json
+import time
+from typing import Dict, List, TextIO, Tuple
+from model import Proposers
+
+class Histogram:
+    # Count, sum, min and max of the observed values, plus counts per power-of-two bucket:
+    # bucket b holds the values v with 2^(b-1) <= v < 2^b, bucket 0 everything below 1
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.buckets: Dict[int, int] = {}
+
+    def observe(self, value: int) -> None:
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bucket = int(value).bit_length() if value >= 1 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, p: float) -> int:
+        # Upper bound of the bucket holding the p-th percentile, capped at the largest value seen
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= p * self.count:
+                return min(2 ** bucket - 1 if bucket else 0, self.max)
+        return None
+
+    def toDict(self) -> Dict:
+        return {'count': self.count, 'sum': self.total, 'min': self.min, 'max': self.max,
+                'p50': self.percentile(0.5), 'p99': self.percentile(0.99), 'buckets': dict(sorted(self.buckets.items()))}
+
+class Metrics:
+    # Instrumentation of one network, attached as network.metrics (None, the default, turns it
+    # off and leaves a single attribute check on the hot paths). The network counts messages
+    # sent, delivered and dropped per type, samples its queue depth at every tick, and times
+    # each proposer's two phases per proposal n, in ticks and in wall-clock microseconds:
+    #   prepare: from PROPOSE to a majority of PROMISEs
+    #   accept:  from there to a majority of ACCEPTEDs
+    # A proposer has at most one phase open: one it never completes, because its n was overtaken,
+    # is dropped when its next phase starts, and counted as abandoned.<phase>.
+    def __init__(self) -> None:
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.series: Dict[str, List[Tuple[int, int]]] = {}
+        self.phases: List[Dict] = []
+        # The open phase of every proposer id, as (phase, n, start tick, start time)
+        self.started: Dict[int, Tuple[str, int, int, float]] = {}
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: int) -> None:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].observe(value)
+
+    def sample(self, name: str, tick: int, value: int) -> None:
+        self.series.setdefault(name, []).append((tick, value))
+        self.observe(name, value)
+
+    def startPhase(self, phase: str, proposer: Proposers, n: int, tick: int) -> None:
+        previous = self.started.get(proposer.id)
+        if previous is not None:
+            self.count(f'abandoned.{previous[0]}')
+        self.started[proposer.id] = (phase, n, tick, time.perf_counter())
+
+    def endPhase(self, phase: str, proposer: Proposers, n: int, tick: int) -> None:
+        start = self.started.get(proposer.id)
+        if start is None or start[:2] != (phase, n):
+            return
+        del self.started[proposer.id]
+        _, _, startTick, startTime = start
+        micros = int(1e6 * (time.perf_counter() - startTime))
+        self.observe(f'{phase}.ticks', tick - startTick)
+        self.observe(f'{phase}.micros', micros)
+        self.phases.append({'proposer': str(proposer), 'n': n, 'phase': phase, 'start': startTick, 'ticks': tick - startTick, 'micros': micros})
+
+    def toDict(self) -> Dict:
+        return {'counters': dict(sorted(self.counters.items())),
+                'histograms': {name: histogram.toDict() for name, histogram in sorted(self.histograms.items())},
+                'series': self.series,
+                'phases': self.phases}
+
+    def writeJSON(self, file: TextIO) -> None:
+        json.dump(self.toDict(), file, indent=2)
+
+    def writeCSV(self, file: TextIO) -> None:
+        # One row per completed phase
+        writer = csv.DictWriter(file, ['proposer', 'n', 'phase', 'start', 'ticks', 'micros'])
+        writer.writeheader()
+        writer.writerows(self.phases)
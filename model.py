@@ -1,8 +1,10 @@
 import math
+from array import array
 from enum import Enum
 from time import sleep
-from config import MAJORITY
-from typing import Dict, List
+from config import MAJORITY, MASTER_TABLE_LIMIT, SNAPSHOT_INTERVAL
+from quorum import ThresholdQuorum, Votes
+from typing import Dict, Iterator, List, TextIO, Tuple
 
 class MessageType(Enum):
     PROPOSE = 1
@@ -12,11 +14,38 @@ class MessageType(Enum):
     ACCEPTED = 5
     REJECTED = 6
 
+class Record:
+    # A saved message. Slotted to keep per-record memory small; supports the
+    # record['field'] / record.get('field') access the dict records used to offer.
+    # slot is the log slot of a Multi-Paxos entry (multipaxos.py), None for the single synod.
+    __slots__ = ('source', 'destination', 'messageType', 'n', 'value', 'messageObj', 'slot')
+
+    def __init__(self, source: 'Computers', destination: 'Computers', messageType: MessageType, n: int, value: int, messageObj: 'Message', slot: int = None) -> None:
+        self.source = source
+        self.destination = destination
+        self.messageType = messageType
+        self.n = n
+        self.value = value
+        self.messageObj = messageObj
+        self.slot = slot
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
 class Computers:
-    def __init__(self, id: int) -> None:
+    def __init__(self, id: int, database: 'DataBase' = None) -> None:
         self.id = id
         self.failed = False
-        self.internalState = Storage()
+        self.internalState = Storage(database)
         self.n = None
         self.value = None
 
@@ -31,41 +60,26 @@ class Computers:
 
     def getValue(self, messageType: MessageType = None) -> int:
         if messageType:
-            return self.internalState.getRecordsByMessageType(messageType)[0]['value']
+            return self.internalState.getRecordsByMessageType(messageType)[0].value
         return self.value
 
-    def saveMessage(self, message) -> None:        
-        record = {
-            'destination': message.destination,
-            'messageType': message.type,
-            'n': self.getN(),
-            'value': self.getValue(),
-            'messageObj': message
-            }
-        if message.type == MessageType.PROPOSE:
-            record['source'] = None
-        else:
-            record['source'] = message.source
+    def saveMessage(self, message) -> None:
+        source = None if message.type == MessageType.PROPOSE else message.source
+        record = Record(source, message.destination, message.type, self.getN(), self.getValue(), message)
         self.internalState.addRecord(record)
 
     def getRecords(self) -> List:
         return self.internalState.getRecords()
 
-    def getMaxNAndValue(self, messageType: MessageType = None) -> int:
-        n = value = -math.inf
-        for record in self.internalState.getRecordsByMessageType(messageType):
-            if n < record['n']:
-                n = record['n']
-                value = record['value']
-        return n, value
-
-    def getLastAccept(self) -> Dict:
-        accepts = self.internalState.getRecordsByMessageType(MessageType.ACCEPT)
-        if accepts:
-            return accepts[-1]
-        return None
+    def getMaxNAndValue(self, messageType: MessageType = None) -> Tuple:
+        return self.internalState.getMaxNAndValue(messageType)
+
+    def getLastAccept(self) -> Record:
+        return self.internalState.getLastRecord(MessageType.ACCEPT)
+
+class Message:
+    __slots__ = ('source', 'destination', 'type')
 
-class Message:    
     def __init__(self, src: Computers, dst: Computers, messageType: MessageType) -> None:
         self.source = src
         self.destination = dst
@@ -81,8 +95,8 @@ class Message:
             lastAccept = self.source.getLastAccept()
             prior = None
             if lastAccept:
-                n = lastAccept['n']
-                value = lastAccept['value']
+                n = lastAccept.n
+                value = lastAccept.value
                 prior = f'n={n}, v={value}'
             result += f'(Prior: {prior}) '
 
@@ -90,15 +104,96 @@ class Message:
             result += f'v={self.destination.value} '
         return result
 
+def checkIntValue(value, where: str, bounded: bool = True) -> None:
+    # The WAL, the TCP transport and replay traces only carry ints as n and value (64-bit ones
+    # when bounded, -2 ** 63 marking a missing one), unlike the master table, which takes anything
+    if value is None or (isinstance(value, int) and (not bounded or -2 ** 63 < value < 2 ** 63)):
+        return
+    raise ValueError(f'{where} only carries {"64-bit " if bounded else ""}int values, not {value!r}')
+
+class MasterTable:
+    # Columnar store for the master table. Every column is a typed array, and nodes are
+    # interned to small ints, so a row costs a few bytes and keeps no Message or Computers alive.
+    # The n or value column turns into a plain list the first time it gets something other than
+    # a 64-bit int. With maxRecords set it becomes a ring buffer that overwrites the oldest rows.
+    NONE = -2 ** 63
+    COLUMNS = {'source': 'i', 'destination': 'i', 'messageType': 'b', 'n': 'q', 'value': 'q'}
+
+    def __init__(self, maxRecords: int = None) -> None:
+        self.maxRecords = maxRecords
+        self.nodes: List[str] = []
+        self.nodeIds: Dict[str, int] = {}
+        self.columns = {col: array(typecode) for col, typecode in self.COLUMNS.items()}
+        self.oldest = 0
+
+    def __len__(self) -> int:
+        return len(self.columns['messageType'])
+
+    def _internNode(self, computer: 'Computers') -> int:
+        if computer is None:
+            return -1
+        name = str(computer)
+        if name not in self.nodeIds:
+            self.nodeIds[name] = len(self.nodes)
+            self.nodes.append(name)
+        return self.nodeIds[name]
+
+    def _encode(self, record: Dict) -> Dict:
+        return {
+            'source': self._internNode(record.get('source')),
+            'destination': self._internNode(record.get('destination')),
+            'messageType': record['messageType'].value,
+            'n': self._encodeNumber('n', record['n']),
+            'value': self._encodeNumber('value', record['value']),
+        }
+
+    def _encodeNumber(self, col: str, number):
+        # NONE stands for None in a typed column; whatever does not fit one turns it into a list
+        column = self.columns[col]
+        if isinstance(column, list):
+            return number
+        if number is None:
+            return self.NONE
+        if not isinstance(number, int) or not self.NONE < number < 2 ** 63:
+            self.columns[col] = [None if item == self.NONE else item for item in column]
+        return number
+
+    def _decode(self, index: int) -> Dict:
+        row = {col: self.columns[col][index] for col in self.COLUMNS}
+        for col in ('source', 'destination'):
+            row[col] = self.nodes[row[col]] if row[col] >= 0 else None
+        row['messageType'] = MessageType(row['messageType'])
+        for col in ('n', 'value'):
+            if not isinstance(self.columns[col], list) and row[col] == self.NONE:
+                row[col] = None
+        return row
+
+    def append(self, record: Dict) -> None:
+        encoded = self._encode(record)
+        if self.maxRecords is not None and len(self) >= self.maxRecords:
+            for col, value in encoded.items():
+                self.columns[col][self.oldest] = value
+            self.oldest = (self.oldest + 1) % self.maxRecords
+        else:
+            for col, value in encoded.items():
+                self.columns[col].append(value)
+
+    def __iter__(self) -> Iterator[Dict]:
+        # Rows from oldest to newest
+        size = len(self)
+        for offset in range(size):
+            yield self._decode((self.oldest + offset) % size)
+
 class DataBase:
-    masterTable = []    
-    def __init__(cls) -> None:
-        pass    
-
-    @classmethod
-    def select(cls, select: List) -> str:
-        result = 'MASTER TABLE'
-        result += '\n'
+    # Master table of every message saved by the computers of one simulation
+    def __init__(self, maxRecords: int = MASTER_TABLE_LIMIT) -> None:
+        self.masterTable = MasterTable(maxRecords)
+
+    def reset(self, maxRecords: int = MASTER_TABLE_LIMIT) -> None:
+        self.masterTable = MasterTable(maxRecords)
+
+    def iterSelect(self, select: List) -> Iterator[str]:
+        # Yields the master table one line at a time
         def round(number):
             return int(math.ceil(int(number) / 10.0)) * 10
         def createBorder():
@@ -106,100 +201,194 @@ class DataBase:
             for col in select:
                 count += 3 + round(len(col))
             return ''.ljust(count, "-") + '-\n'
-        
-        result += createBorder()
-        # Print Heading                
-        for col in select:
-            result += f'|  {col.ljust(round(len(col)), " ")}'
-        result += '|\n'
 
-        result += createBorder()
+        yield 'MASTER TABLE\n'
+        yield createBorder()
+        # Print Heading
+        yield ''.join(f'|  {col.ljust(round(len(col)), " ")}' for col in select) + '|\n'
+        yield createBorder()
         # Print Records
-        for record in cls.masterTable:
-            line = ''
-            for col in select:
-                if col in record:
-                    line += f'|  {str(record[col]).ljust(round(len(col)), " ")}'
-            line += '|\n'
-            result += line
-        result += createBorder()
-        return result
+        for record in self.masterTable:
+            yield ''.join(f'|  {str(record[col]).ljust(round(len(col)), " ")}' for col in select if col in record) + '|\n'
+        yield createBorder()
+
+    def select(self, select: List, writer: TextIO = None) -> str:
+        # Streams the table to writer if one is given, otherwise returns it as a string
+        if writer is None:
+            return ''.join(self.iterSelect(select))
+        for line in self.iterSelect(select):
+            writer.write(line)
+        return None
 
-    @classmethod
-    def addRecord(cls, record: Dict) -> None:
-        cls.masterTable.append(record)
+    def addRecord(self, record: Dict) -> None:
+        self.masterTable.append(record)
 
-    @classmethod
-    def getRecordsByMessageType(cls, messageType: MessageType) -> List[Dict]:
-        result = []
-        for record in cls.masterTable:
-            if record['messageType'] == messageType:
-                result.append(record)
-        return result
+    def getRecordsByMessageType(self, messageType: MessageType) -> List[Dict]:
+        return [record for record in self.masterTable if record['messageType'] == messageType]
 
 class Storage:
-    def __init__(self) -> None:
+    # Records are kept in arrival order, plus indexes maintained on every insert so per-type
+    # lookups never rescan the history: the records of each MessageType, and the record with the
+    # highest n of each type (key None covers all records), and the latest record of each log slot.
+    # An optional persistence backend (see persistence.py) receives every new record as well.
+    # Every snapshotInterval records the history is compacted to a snapshot: the records these
+    # lookups can still return, i.e. the first, the last and the highest-n record of each type
+    # and the latest record of each slot.
+    def __init__(self, database: DataBase = None, backend=None, snapshotInterval: int = SNAPSHOT_INTERVAL) -> None:
         super().__init__()
+        self.database = database
+        self.backend = backend
+        self.snapshotInterval = snapshotInterval
+        self.sinceSnapshot = 0
         self.internal = []
+        self.byMessageType: Dict[MessageType, List[Record]] = {}
+        self.maxRecord: Dict[MessageType, Record] = {}
+        self.bySlot: Dict[int, Record] = {}
         
-    def addRecord(self, record: Dict) -> None:
+    def addRecord(self, record: Record) -> None:
+        self.loadRecord(record)
+        if self.backend is not None:
+            self.backend.append(record)
+        if self.database is not None:
+            self.database.addRecord(record)
+        self.sinceSnapshot += 1
+        if self.snapshotInterval and self.sinceSnapshot >= self.snapshotInterval:
+            self.compact()
+
+    def loadRecord(self, record: Record) -> None:
+        # Adds a record to the in-memory state only, e.g. when replaying it from the backend
         self.internal.append(record)
-        DataBase.addRecord(record)
+        self.byMessageType.setdefault(record.messageType, []).append(record)
+        for key in (record.messageType, None):
+            if key not in self.maxRecord or self.maxRecord[key].n < record.n:
+                self.maxRecord[key] = record
+        if record.slot is not None:
+            self.bySlot[record.slot] = record
+
+    def compact(self) -> None:
+        # Truncates the history to a snapshot, in memory and in the backend
+        keep = set()
+        for messageType, records in self.byMessageType.items():
+            keep.update((id(records[0]), id(records[-1]), id(self.maxRecord[messageType])))
+        keep.update(id(record) for record in self.bySlot.values())
+        snapshot = [record for record in self.internal if id(record) in keep]
+        self.internal = []
+        self.byMessageType = {}
+        self.maxRecord = {}
+        self.bySlot = {}
+        for record in snapshot:
+            self.loadRecord(record)
+        if self.backend is not None:
+            self.backend.rewrite(snapshot)
+        self.sinceSnapshot = 0
+
+    def copy(self) -> 'Storage':
+        # A separate Storage over the same records and backends, e.g. to roll a computer back to later
+        storage = Storage(self.database, self.backend, self.snapshotInterval)
+        storage.sinceSnapshot = self.sinceSnapshot
+        storage.internal = list(self.internal)
+        storage.byMessageType = {messageType: list(records) for messageType, records in self.byMessageType.items()}
+        storage.maxRecord = dict(self.maxRecord)
+        storage.bySlot = dict(self.bySlot)
+        return storage
+
+    def mark(self) -> Tuple:
+        # Where the history stands, for truncate() to roll it back to as long as it is not compacted
+        lengths = {messageType: len(records) for messageType, records in self.byMessageType.items()}
+        return len(self.internal), lengths, dict(self.maxRecord), dict(self.bySlot), self.sinceSnapshot
+
+    def truncate(self, mark: Tuple) -> None:
+        # Drops every record added since mark, without rebuilding the indexes
+        length, lengths, maxRecord, bySlot, self.sinceSnapshot = mark
+        del self.internal[length:]
+        for messageType in list(self.byMessageType):
+            if messageType in lengths:
+                del self.byMessageType[messageType][lengths[messageType]:]
+            else:
+                del self.byMessageType[messageType]
+        self.maxRecord = dict(maxRecord)
+        self.bySlot = dict(bySlot)
 
-    def getRecords(self) -> List[Dict]:
+    def getRecords(self) -> List[Record]:
         return self.internal
 
     def getRecordsById(self, des: int):
         pass
 
-    def getRecordsByMessageType(self, messageType: MessageType = None) -> List[Dict]:
+    def getRecordsByMessageType(self, messageType: MessageType = None) -> List[Record]:
         if not messageType:
             return self.getRecords()
+        return self.byMessageType.get(messageType, [])
 
-        result = []
-        for record in self.getRecords():
-            if record['messageType'] == messageType:
-                result.append(record)
-        return result
+    def getMaxNAndValue(self, messageType: MessageType = None) -> Tuple:
+        # Highest n seen in the records of messageType, with the value recorded alongside it
+        record = self.maxRecord.get(messageType)
+        return (record.n, record.value) if record else (-math.inf, -math.inf)
+
+    def getMaxRecord(self, messageType: MessageType = None) -> Record:
+        return self.maxRecord.get(messageType)
+
+    def getSlots(self, fromSlot: int = 0) -> Dict[int, Record]:
+        # The latest record of every slot from fromSlot on
+        return {slot: record for slot, record in self.bySlot.items() if slot >= fromSlot}
+
+    def getLastRecord(self, messageType: MessageType) -> Record:
+        records = self.byMessageType.get(messageType)
+        return records[-1] if records else None
 
 class Propose(Message):
+    __slots__ = ()
+
     def __init__(self, src: Computers, dst: Computers) -> None:
         super().__init__(src, dst, MessageType.PROPOSE)
 
 class Prepare(Message):
+    __slots__ = ()
+
     def __init__(self, src: Computers, dst: Computers) -> None:
         super().__init__(src, dst, MessageType.PREPARE)
 
 class Promise(Message):
+    __slots__ = ()
+
     def __init__(self, src: Computers, dst: Computers) -> None:
         super().__init__(src, dst, MessageType.PROMISE)
 
 class Accept(Message):
+    __slots__ = ()
+
     def __init__(self, src: Computers, dst: Computers) -> None:
         super().__init__(src, dst, MessageType.ACCEPT)
 
 class Accepted(Message):
+    __slots__ = ()
+
     def __init__(self, src: Computers, dst: Computers) -> None:
         super().__init__(src, dst, MessageType.ACCEPTED)
 
 class Rejected(Message):
+    __slots__ = ()
+
     def __init__(self, src: Computers, dst: Computers) -> None:
         super().__init__(src, dst, MessageType.REJECTED)  
 
 class Acceptors(Computers):
-    def __init__(self, id: int) -> None:
-        super().__init__(id)
+    def __init__(self, id: int, database: DataBase = None) -> None:
+        super().__init__(id, database)
         self.setN(1)
 
     def __str__(self) -> str:
         return f'A{self.id}'
 
 class Proposers(Computers):
-    def __init__(self, id: int) -> None:
-        super().__init__(id)
+    def __init__(self, id: int, database: DataBase = None, majority: int = MAJORITY, quorum=None) -> None:
+        super().__init__(id, database)
+        self.majority = majority
+        # Which sets of acceptors are enough, in each phase: any quorum.py quorum system
+        self.quorum = quorum if quorum is not None else ThresholdQuorum(majority)
         self.consensus = False       
-        self.acceptedBy = {}
-        self.promisedBy = {}
+        self.acceptedBy = Votes()
+        self.promisedBy = Votes()
 
     def __str__(self) -> str:
         return f'P{self.id}'
@@ -209,10 +398,10 @@ class Proposers(Computers):
             return self.consensus
         if MessageType.PROMISE == messageType:
             if self.getN() in self.promisedBy:
-                return len(self.promisedBy[self.getN()]) >= MAJORITY
+                return self.quorum.isPhase1Quorum(self.promisedBy.voters)
         elif MessageType.ACCEPTED == messageType:
             if self.getN() in self.acceptedBy:
-                if len(self.acceptedBy[self.getN()]) >= MAJORITY:
+                if self.quorum.isPhase2Quorum(self.acceptedBy.voters):
                     self.consensus = True
                 else:
                     self.consensus = False
@@ -221,13 +410,7 @@ class Proposers(Computers):
 
     def addVote(self, messageType: MessageType, computer: Computers) -> None:
         if MessageType.PROMISE == messageType:
-            if computer.getN() in self.promisedBy:
-                self.promisedBy[computer.getN()].append(computer)
-            else:
-                self.promisedBy[computer.getN()] = [computer]
+            self.promisedBy.add(computer.getN(), computer)
         elif MessageType.ACCEPTED == messageType:
-            if computer.getN() in self.acceptedBy:
-                self.acceptedBy[computer.getN()].append(computer)
-            else:
-                self.acceptedBy[computer.getN()] = [computer]
+            self.acceptedBy.add(computer.getN(), computer)
         return
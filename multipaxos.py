@@ -0,0 +1,344 @@
+from collections import deque
+from itertools import count
+from typing import Deque, Dict, List, Set, Tuple
+from network import Network, Event
+from model import Proposers, Acceptors, Message, MessageType, Record, DataBase
+from scheduler import EventScheduler
+from simulation import SimulationRun
+from tracing import ERROR
+from config import NO_OF_PROPOSERS, NO_OF_ACCEPTORS, MAX_DURATION, BATCH_SIZE, BATCH_WAIT, PIPELINE_WINDOW, FORWARD_TIMEOUT
+
+class LogMessage(Message):
+    # A Message about one slot of the replicated log. The single-synod messages read n and value
+    # off their endpoints when delivered; these carry them, since a leader has many slots in flight.
+    #   PROPOSE:  value is a client command or list of them; when a proposer forwards them to the
+    #             one it takes for the leader, it is the list of (arrival tick, command), and slot
+    #             numbers the forward
+    #   ACCEPTED: from a proposer, acknowledges the forward numbered slot
+    #   PREPARE:  slot is the first slot the proposer does not know to be chosen, n the new ballot
+    #   PROMISE:  value holds the acceptor's accepted entries from that slot on, {slot: (n, value)}
+    #   REJECTED: n is the higher ballot the acceptor has already promised, value its proposer
+    __slots__ = ('slot', 'n', 'value')
+
+    def __init__(self, src: Proposers, dst: Acceptors, messageType: MessageType, slot: int, n: int, value) -> None:
+        super().__init__(src, dst, messageType)
+        self.slot = slot
+        self.n = n
+        self.value = value
+
+    def __str__(self) -> str:
+        result = f'{MessageType(self.type).name.ljust(10, " ")} '
+        if self.slot is not None:
+            result += f's={self.slot} '
+        if self.n is not None:
+            result += f'n={self.n} '
+        if self.type == MessageType.PROMISE:
+            result += f'(Prior: {self.value or None}) '
+        elif self.value is not None:
+            result += f'v={self.value} '
+        return result
+
+class LeaderState:
+    # What one Proposer knows while it tries to lead, or leads, the log
+    def __init__(self) -> None:
+        self.ballot = None
+        self.isLeader = False
+        self.preparing = False
+        # The Proposer this one takes for the leader, learnt from a REJECTED; None when it does
+        # not know of one, or is the leader or trying to become it itself
+        self.leader: Proposers = None
+        # The slots this Proposer saw chosen, by a majority of ACCEPTEDs for its own ballot
+        self.chosen: Dict[int, Tuple[int, ...]] = {}
+        # Every command it saw chosen, has in flight or pending, so that it takes none twice
+        self.seen: Set[int] = set()
+        # Forwards to the leader not acknowledged yet: number -> (tick sent, commands)
+        self.forwarded: Dict[int, Tuple[int, List[Tuple[int, int]]]] = {}
+        self.promisedBy: Set[Acceptors] = set()
+        # Highest-ballot accepted entry per slot reported by the promises so far
+        self.prior: Dict[int, Tuple[int, int]] = {}
+        # Client commands not yet assigned to a slot, as (arrival tick, command)
+        self.pending: Deque[Tuple[int, int]] = deque()
+        # Slots sent in ACCEPT and not yet chosen, with their batch and who accepted them
+        self.inflight: Dict[int, Tuple[int, ...]] = {}
+        self.acceptedBy: Dict[int, Set[Acceptors]] = {}
+        self.nextSlot = 0
+
+class MultiPaxosNetwork(Network):
+    # Multi-Paxos over the same Proposers, Acceptors and message queue as the single-synod engine.
+    # A Proposer runs Phase 1 once with a fresh ballot; a majority of promises covers every
+    # slot from then on, so each further command costs one ACCEPT/ACCEPTED round.
+    # A Proposer acts on what it knows itself: commands that reach one that was rejected by a
+    # higher ballot are forwarded to that ballot's Proposer, and each Proposer starts Phase 1 from
+    # the first slot it has not seen chosen. A leader acknowledges forwarded commands; when one
+    # does not within forwardTimeout ticks, the follower runs Phase 1 itself instead.
+    # Commands are taken to be unique, like the request ids of clients, so that a command a
+    # preempted leader forwards is dropped by a new one that already re-proposed it from a prior.
+    # Acceptors keep their promises and accepted entries as records in their Storage, where a
+    # WAL and snapshots see them (persistence.py).
+    # The value of each slot is a batch of up to maxBatchSize commands; a partial batch goes out
+    # once its oldest command has waited maxBatchWait ticks. At most window slots are in flight.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, events: EventScheduler = None, database: DataBase = None) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, events, database)
+        self.maxBatchSize = BATCH_SIZE
+        self.maxBatchWait = BATCH_WAIT
+        self.window = PIPELINE_WINDOW
+        self.forwardTimeout = FORWARD_TIMEOUT
+        self.ballots = count(1)
+        self.forwards = count()
+        self.state: Dict[Proposers, LeaderState] = {proposer: LeaderState() for proposer in self.proposers}
+        # The replicated log as an observer sees it: the batch chosen for each slot, as first
+        # reported by any Proposer. No Proposer reads it.
+        self.log: Dict[int, Tuple[int, ...]] = {}
+        # Safety violations: (slot, batch chosen first, different batch chosen later)
+        self.conflicts: List[Tuple[int, Tuple[int, ...], Tuple[int, ...]]] = []
+
+    def getSlots(self) -> List[Tuple[int, ...]]:
+        # Chosen batches in slot order, up to the first gap
+        result = []
+        while len(result) in self.log:
+            result.append(self.log[len(result)])
+        return result
+
+    def getLog(self) -> List[int]:
+        # Chosen commands in order, up to the first gap
+        return [command for batch in self.getSlots() for command in batch]
+
+    def _firstUnchosenSlot(self, state: LeaderState) -> int:
+        slot = 0
+        while slot in state.chosen:
+            slot += 1
+        return slot
+
+    def _unchosenCommands(self, state: LeaderState) -> List[Tuple[int, int]]:
+        # Commands of in-flight batches not seen to make it into their slot, due for resending now
+        due = self.currentTick - self.maxBatchWait
+        return [(due, command) for slot, batch in sorted(state.inflight.items()) if state.chosen.get(slot) != batch for command in batch]
+
+    def _choose(self, proposer: Proposers, slot: int, value: Tuple[int, ...]) -> None:
+        self.state[proposer].chosen[slot] = value
+        self.state[proposer].seen.update(value)
+        chosen = self.log.setdefault(slot, value)
+        if chosen != value:
+            self.conflicts.append((slot, chosen, value))
+            self.trace.log(ERROR, 'Safety violation: slot {} chosen as {} and as {}', slot, chosen, value)
+
+    def _canSend(self, state: LeaderState) -> bool:
+        return state.isLeader and bool(state.pending) and (self.window is None or len(state.inflight) < self.window)
+
+    def onTick(self, tick: int) -> None:
+        super().onTick(tick)
+        for proposer, state in self.state.items():
+            if state.forwarded and min(sent for sent, _ in state.forwarded.values()) + self.forwardTimeout <= tick:
+                self._stopFollowing(proposer)
+            if self._canSend(state):
+                self._drain(proposer)
+
+    def nextWakeup(self) -> int:
+        # When the oldest waiting command of a leader with room in its window is due, or the
+        # oldest unacknowledged forward of a follower times out
+        deadlines = [state.pending[0][0] + self.maxBatchWait for state in self.state.values() if self._canSend(state)]
+        deadlines += [sent + self.forwardTimeout for state in self.state.values() for sent, _ in state.forwarded.values()]
+        return min(deadlines) if deadlines else None
+
+    def _stopFollowing(self, proposer: Proposers) -> None:
+        # The leader did not answer: take back what was forwarded to it and compete for the lead
+        state = self.state[proposer]
+        commands = [command for _, (_, forwarded) in sorted(state.forwarded.items()) for command in forwarded]
+        state.forwarded.clear()
+        state.leader = None
+        self._submit(proposer, commands)
+
+    def _broadcast(self, proposer: Proposers, messageType: MessageType, slot: int, n: int, value) -> None:
+        for acceptor in self.acceptors:
+            self.QueueMessage(LogMessage(proposer, acceptor, messageType, slot, n, value))
+
+    def _startPhase1(self, proposer: Proposers) -> None:
+        state = self.state[proposer]
+        # Anything this Proposer had in flight goes back in front of its pending commands
+        state.pending.extendleft(reversed(self._unchosenCommands(state)))
+        state.inflight.clear()
+        state.acceptedBy.clear()
+        state.ballot = next(self.ballots)
+        state.isLeader = False
+        state.preparing = True
+        state.leader = None
+        state.promisedBy = set()
+        state.prior = {}
+        proposer.setN(state.ballot)
+        self._broadcast(proposer, MessageType.PREPARE, self._firstUnchosenSlot(state), state.ballot, None)
+
+    def _sendAccept(self, proposer: Proposers, slot: int, value: Tuple[int, ...]) -> None:
+        state = self.state[proposer]
+        state.inflight[slot] = value
+        state.acceptedBy[slot] = set()
+        self._broadcast(proposer, MessageType.ACCEPT, slot, state.ballot, value)
+
+    def _drain(self, proposer: Proposers) -> None:
+        # Packs the pending commands of a leader into batches and assigns them to the next free
+        # slots, while the window has room and a batch is either full or has waited long enough
+        state = self.state[proposer]
+        while self._canSend(state):
+            if len(state.pending) < self.maxBatchSize and state.pending[0][0] + self.maxBatchWait > self.currentTick:
+                break
+            batch = tuple(state.pending.popleft()[1] for _ in range(min(self.maxBatchSize, len(state.pending))))
+            slot = state.nextSlot
+            state.nextSlot += 1
+            self._sendAccept(proposer, slot, batch)
+
+    def _becomeLeader(self, proposer: Proposers) -> None:
+        state = self.state[proposer]
+        state.isLeader = True
+        state.preparing = False
+        state.nextSlot = max(list(state.prior) + list(state.chosen) + [-1]) + 1
+        # Finish whatever earlier leaders may have had chosen before taking new commands, and
+        # drop the pending copies of the commands that brings back
+        reproposed = set()
+        for slot, (_, value) in sorted(state.prior.items()):
+            if slot not in state.chosen:
+                self._sendAccept(proposer, slot, value)
+                reproposed.update(value)
+        if reproposed:
+            state.pending = deque(entry for entry in state.pending if entry[1] not in reproposed)
+            state.seen.update(reproposed)
+        self._drain(proposer)
+
+    def _submit(self, proposer: Proposers, commands: List[Tuple[int, int]]) -> None:
+        state = self.state[proposer]
+        if state.leader is not None:
+            # Forwarded as a message, which waits while either end is down
+            forward = next(self.forwards)
+            state.forwarded[forward] = (self.currentTick, commands)
+            self.QueueMessage(LogMessage(proposer, state.leader, MessageType.PROPOSE, forward, None, commands))
+            return
+        for entry in commands:
+            if entry[1] not in state.seen:
+                state.seen.add(entry[1])
+                state.pending.append(entry)
+        if state.isLeader:
+            self._drain(proposer)
+        elif not state.preparing:
+            self._startPhase1(proposer)
+
+    def _reject(self, acceptor: Acceptors, message: LogMessage) -> None:
+        # Names the Proposer of the highest ballot the acceptor holds, so the sender can follow it
+        holder = acceptor.internalState.getMaxRecord()
+        self.QueueMessage(LogMessage(acceptor, message.source, MessageType.REJECTED, message.slot, acceptor.getN(), holder.source if holder else None))
+
+    def DeliverMessage(self, computer, message: LogMessage) -> None:
+        try:
+            if message.type == MessageType.PROPOSE:
+                if message.source is not None:
+                    # Commands another Proposer forwarded, with the ticks they first arrived at
+                    self.QueueMessage(LogMessage(computer, message.source, MessageType.ACCEPTED, message.slot, None, None))
+                    self._submit(computer, message.value)
+                    return
+                # A client request carries one command, or a list of commands sent together
+                commands = message.value if isinstance(message.value, (list, tuple)) else [message.value]
+                self._submit(computer, [(self.currentTick, command) for command in commands])
+                return
+
+            if message.type == MessageType.PREPARE:
+                if computer.getN() <= message.n:
+                    computer.setN(message.n)
+                    computer.internalState.addRecord(Record(message.source, computer, MessageType.PROMISE, message.n, None, message))
+                    prior = {slot: (record.n, record.value) for slot, record in computer.internalState.getSlots(message.slot).items()}
+                    self.QueueMessage(LogMessage(computer, message.source, MessageType.PROMISE, message.slot, message.n, prior))
+                else:
+                    self._reject(computer, message)
+                return
+
+            if message.type == MessageType.PROMISE:
+                state = self.state[computer]
+                if not state.preparing or message.n != state.ballot:
+                    # A promise for an older ballot, or one that arrived after the majority
+                    return
+                state.promisedBy.add(message.source)
+                for slot, (n, value) in message.value.items():
+                    if slot not in state.prior or state.prior[slot][0] < n:
+                        state.prior[slot] = (n, value)
+                if len(state.promisedBy) >= computer.majority:
+                    self._becomeLeader(computer)
+                return
+
+            if message.type == MessageType.ACCEPT:
+                if computer.getN() <= message.n:
+                    computer.setN(message.n)
+                    computer.internalState.addRecord(Record(message.source, computer, MessageType.ACCEPT, message.n, message.value, message, message.slot))
+                    self.QueueMessage(LogMessage(computer, message.source, MessageType.ACCEPTED, message.slot, message.n, message.value))
+                else:
+                    self._reject(computer, message)
+                return
+
+            if message.type == MessageType.ACCEPTED:
+                state = self.state[computer]
+                if isinstance(message.source, Proposers):
+                    # The leader has the commands of this forward now
+                    state.forwarded.pop(message.slot, None)
+                    return
+                if message.n != state.ballot or message.slot not in state.inflight:
+                    return
+                state.acceptedBy[message.slot].add(message.source)
+                if len(state.acceptedBy[message.slot]) >= computer.majority:
+                    del state.inflight[message.slot]
+                    del state.acceptedBy[message.slot]
+                    self._choose(computer, message.slot, message.value)
+                    # The window has room again
+                    self._drain(computer)
+                return
+
+            if message.type == MessageType.REJECTED:
+                state = self.state[computer]
+                if state.ballot is None or message.n <= state.ballot:
+                    # Already moved past the ballot that was rejected
+                    return
+                # Someone holds a higher ballot: step down and hand what is left to its Proposer
+                state.isLeader = False
+                state.preparing = False
+                state.leader = message.value
+                commands = self._unchosenCommands(state) + list(state.pending)
+                state.inflight.clear()
+                state.acceptedBy.clear()
+                state.pending.clear()
+                state.seen = {command for batch in state.chosen.values() for command in batch}
+                if commands:
+                    self._submit(computer, commands)
+                return
+
+        except Exception as ex:
+            self.trace.log(ERROR, 'Exception: {}', ex, end=' | ')
+        finally:
+            if self.metrics is not None:
+                self.metrics.count(f'delivered.{message.type.name}')
+            self.printMessage(computer, message)
+
+class MultiPaxosRun(SimulationRun):
+    # Each Propose event submits a client command (or a list of them) to the replicated log
+    NETWORK = MultiPaxosNetwork
+
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, maxSimulationDuration: int, eventsList: List[Event], seed: int = None,
+                 maxBatchSize: int = BATCH_SIZE, maxBatchWait: int = BATCH_WAIT, window: int = PIPELINE_WINDOW, forwardTimeout: int = FORWARD_TIMEOUT) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, maxSimulationDuration, eventsList, seed)
+        self.network.maxBatchSize = maxBatchSize
+        self.network.maxBatchWait = maxBatchWait
+        self.network.window = window
+        self.network.forwardTimeout = forwardTimeout
+
+    def _propose(self, proposer: Proposers, value: int) -> None:
+        # PROPOSE messages bypass the network and are delivered directly to the specified Proposer
+        self.network.DeliverMessage(proposer, LogMessage(None, proposer, MessageType.PROPOSE, None, None, value))
+
+if __name__ == '__main__':
+    # P1 leads the first commands, fails, P2 takes over, and P1 steps down once it recovers
+    events = [Event(tick, None, None, Proposers(1), value) for tick, value in enumerate([11, 12, 13])]
+    events.append(Event(12, [Proposers(1)], None, None, None))
+    events += [Event(tick, None, None, Proposers(2), value) for tick, value in zip(range(14, 17), [21, 22, 23])]
+    events.append(Event(40, None, [Proposers(1)], None, None))
+    events.append(Event(41, None, None, Proposers(1), 14))
+
+    run = MultiPaxosRun(NO_OF_PROPOSERS, NO_OF_ACCEPTORS, MAX_DURATION * 2, events)
+    result = run.simulate()
+    print()
+    print(f'Log: {run.network.getLog()}')
+    if run.network.conflicts:
+        print(f'Conflicting choices: {run.network.conflicts}')
+    print(f'Messages: {run.network.network.queued}, Ticks: {result.ticks}')
@@ -1,10 +1,13 @@
 import math
-from collections import deque
-from typing import List, Union
-from unittest import result
-from config import CONSENSUS_REACHED, EVENTS
-from model import Computers, Proposers, Acceptors
+import heapq
+from itertools import count
+from typing import Dict, List, Set, Tuple, Union
+from model import Computers, Proposers, Acceptors, DataBase
 from model import MessageType, Prepare, Promise, Accept, Accepted, Rejected, Message
+from scheduler import EventScheduler
+from quorum import MajorityQuorum
+from config import RETRY_ON_REJECTED
+from tracing import Trace, ERROR, DEBUG
 
 class Event:
     def __init__(self, tick: int, failure: List[Computers], recovery: List[Computers], request: Computers, value: int) -> None:
@@ -24,26 +27,143 @@ class Event:
             result += f'Req By: {self.request}; Value: {self.proposedValue}'
         return result
 
+class Peer:
+    # The sender of a message as its receiver sees it, when messages carry their sender's state
+    # instead of reading it off the sender at delivery: which computer it is, and its n and value
+    # as they were when it sent the message. The handlers in Network.DeliverMessage read these
+    # instead of the sender's own object. The records a sender keeps of its messages are its own,
+    # saved as it sends them (AsyncNetwork in transport.py, ExplorerNetwork in explorer.py), so
+    # saveMessage does nothing.
+    __slots__ = ('kind', 'id', 'n', 'value')
+
+    def __init__(self, kind: int, id: int, n: int, value: int) -> None:
+        self.kind = kind
+        self.id = id
+        self.n = n
+        self.value = value
+
+    def __str__(self) -> str:
+        return f'{"P" if self.kind == 0 else "A"}{self.id}'
+
+    def getN(self) -> int:
+        return self.n
+
+    def getValue(self, messageType: MessageType = None) -> int:
+        return self.value
+
+    def saveMessage(self, message: Message) -> None:
+        return
+
+# Messages whose record the simulation saves in the sender's storage when they are delivered
+SAVED_BY_SENDER = (MessageType.PREPARE, MessageType.PROMISE, MessageType.ACCEPTED)
+
+class MessageQueue:
+    # FIFO queue of in-flight messages, indexed by whether both endpoints are alive.
+    # Every message gets a sequence number; deliverable ones sit in a min-heap keyed on it,
+    # so the head of the heap is always the oldest message whose src and dst are up.
+    # Messages touching a failed computer are parked by bumping their blocked count,
+    # and a recovery re-pushes every message it unblocks in one pass.
+    def __init__(self) -> None:
+        self.sequence = count()
+        self.pending: Dict[int, Message] = {}
+        self.blocked: Dict[int, int] = {}
+        self.ready: List[int] = []
+        self.touching: Dict[Computers, Dict[int, Message]] = {}
+        # Total number of messages ever queued
+        self.queued = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def __iter__(self):
+        return iter(self.pending.values())
+
+    def _endpoints(self, message: Message) -> List[Computers]:
+        if message.type == MessageType.PROPOSE and message.source is None:
+            # PROPOSE messages from outside the system are never held back; one a proposer
+            # forwards (multipaxos.py) waits for both ends like any other message
+            return []
+        return [message.source, message.destination]
+
+    def append(self, message: Message) -> None:
+        self.queued += 1
+        seq = next(self.sequence)
+        self.pending[seq] = message
+        blocked = 0
+        for computer in self._endpoints(message):
+            self.touching.setdefault(computer, {})[seq] = message
+            if computer.failed:
+                blocked += 1
+        self.blocked[seq] = blocked
+        if blocked == 0:
+            heapq.heappush(self.ready, seq)
+
+    def hasDeliverable(self) -> bool:
+        # Drops stale heap entries (already extracted, or parked after being pushed) off the top
+        while self.ready and (self.ready[0] not in self.pending or self.blocked[self.ready[0]]):
+            heapq.heappop(self.ready)
+        return len(self.ready) > 0
+
+    def popDeliverable(self) -> Message:
+        if self.hasDeliverable():
+            seq = heapq.heappop(self.ready)
+            message = self.pending.pop(seq)
+            del self.blocked[seq]
+            for computer in self._endpoints(message):
+                del self.touching[computer][seq]
+            return message
+        return None
+
+    def fail(self, computer: Computers) -> None:
+        for seq in self.touching.get(computer, {}):
+            self.blocked[seq] += 1
+
+    def recover(self, computer: Computers) -> None:
+        for seq in self.touching.get(computer, {}):
+            self.blocked[seq] -= 1
+            if self.blocked[seq] == 0:
+                heapq.heappush(self.ready, seq)
+
 class Network:
-    def __init__(self, noOfProposers: int, noOfAcceptors: int) -> None:
-        self.network = deque()
-        self.proposers = [Proposers(i+1) for i in range(noOfProposers)]
-        self.acceptors = [Acceptors(i+1) for i in range(noOfAcceptors)]
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, events: EventScheduler = None, database: DataBase = None) -> None:
+        self.network = MessageQueue()
+        self.events = events if events is not None else EventScheduler()
+        self.majority = (noOfAcceptors // 2) + 1
+        self.quorum = MajorityQuorum(noOfAcceptors)
+        self.proposers = [Proposers(i+1, database, self.majority, self.quorum) for i in range(noOfProposers)]
+        self.acceptors = [Acceptors(i+1, database) for i in range(noOfAcceptors)]
+        # Every computer by (type, id), so events and decoded frames find theirs without a scan
+        self.computerIndex: Dict[Tuple[type, int], Computers] = {(type(computer), computer.id): computer for computer in self.proposers + self.acceptors}
+        # Every consensus reached on this network, as (proposer, proposed value, accepted value)
+        self.consensusReached: List[Tuple[Proposers, int, int]] = []
+        self.currentTick = 0
+        self.retryOnRejected = RETRY_ON_REJECTED
+        # Attach a metrics.Metrics here to instrument the network
+        self.metrics = None
+        self.trace = Trace()
+        # Attach a replay.TraceWriter here to record the run
+        self.recorder = None
 
     def __len__(self) -> int:
         return len(self.network)
 
+    def setQuorum(self, quorum) -> None:
+        # The quorum system every proposer counts its votes against (quorum.py)
+        self.quorum = quorum
+        for proposer in self.proposers:
+            proposer.quorum = quorum
+
     def getComputers(self, computerType: Union[Proposers, Acceptors] = None) -> List:
         if computerType:
             return self.proposers if computerType == Proposers else self.acceptors
         return self.proposers + self.acceptors
 
     def getComputerById(self, computerType: Union[Proposers, Acceptors], id: int) -> Computers:
-        lookThrough = self.getComputers(computerType)
-        for computer in lookThrough:
-                if computer.id == id:
-                    return computer
-        return None
+        return self.computerIndex.get((computerType, id))
+
+    def _local(self, peer: Peer) -> Computers:
+        # The computer of this network a Peer stands for
+        return self.getComputerById(Proposers if peer.kind == 0 else Acceptors, peer.id)
 
     def getComputerByN(self, computerType: Union[Proposers, Acceptors], n: int) -> Computers:
         lookThrough = self.getComputers(computerType)
@@ -52,33 +172,68 @@ class Network:
                     return computer
         return None
 
+    def onTick(self, tick: int) -> None:
+        # Called at the start of every tick the simulation processes
+        self.currentTick = tick
+        if self.metrics is not None:
+            self.metrics.sample('queueDepth', tick, len(self))
+
+    def nextWakeup(self) -> int:
+        # Earliest tick at which the network has timed work of its own (None if it has none),
+        # so the simulation does not skip past it
+        return None
+
+    def setFailed(self, computer: Computers, failed: bool) -> None:
+        # Failures and recoveries must go through the network so queued messages are re-indexed
+        if computer.failed == failed:
+            return
+        computer.failed = failed
+        if self.recorder is not None:
+            self.recorder.setFailed(self.currentTick, computer, failed)
+        if self.metrics is not None:
+            self.metrics.count('failures' if failed else 'recoveries')
+        if failed:
+            self.network.fail(computer)
+        else:
+            self.network.recover(computer)
+
     def QueueMessage(self, message: Message) -> None:
         # Adds message m to the end of the queue.
         self.network.append(message)
+        if self.metrics is not None:
+            self.metrics.count(f'sent.{message.type.name}')
 
     def ExtractMessage(self) -> Message:
         # Finds the first message m in the queue such that m.src.failed = false and m.dst.failed = false. 
         # If such a message exists, m is removed from N and returned as the result of Extract-Message. 
         # If no such message exists, a null value is returned.
-        for message in self.network:
-            if message.type == MessageType.PROPOSE:
-                self.network.remove(message)
-                return message
-            if not message.source.failed and not message.destination.failed:
-                self.network.remove(message)
-                return message
-        return None
+        return self.network.popDeliverable()
+
+    def ExtractMessages(self, busy: Set[Computers]) -> List[Message]:
+        # Messages to deliver in this tick, given the computers that already did work in it.
+        # Only one computer can do any work per tick, so that is at most one message.
+        if busy:
+            return []
+        message = self.ExtractMessage()
+        return [message] if message else []
+
+    def hasDeliverableMessage(self) -> bool:
+        return self.network.hasDeliverable()
 
     def printMessage(self, computer: Computers, message: Message):
-        print(f'{message.source if message.source else "  "} -> {message.destination}\t{message}')
+        self.trace.log(DEBUG, '{} -> {}\t{}', message.source if message.source else '  ', message.destination, message)
         return
 
     def DeliverMessage(self, computer: Computers, message: Message) -> None:
         # While awake, the computer can update its internal state and can call Queue-Message any number of times, 
         # but it cannot call Extract-Message.
+        if self.recorder is not None:
+            self.recorder.deliver(self.currentTick, message)
 
         try:            
             if message.type == MessageType.PROPOSE:
+                if self.metrics is not None:
+                    self.metrics.startPhase('prepare', computer, computer.getN(), self.currentTick)
                 for acceptor in self.acceptors:
                     prepare = Prepare(computer, acceptor)
                     self.QueueMessage(prepare)
@@ -108,6 +263,9 @@ class Network:
                         return
                     computer.addVote(MessageType.PROMISE, message.source)
                     if computer.hasMajority(MessageType.PROMISE):
+                        if self.metrics is not None:
+                            self.metrics.endPhase('prepare', computer, computer.getN(), self.currentTick)
+                            self.metrics.startPhase('accept', computer, computer.getN(), self.currentTick)
                         # Send an accept request to all the acceptors
                         for acceptor in self.acceptors:
                             accept = Accept(computer, acceptor)
@@ -116,10 +274,14 @@ class Network:
                 elif computer.getN() > message.source.getN():
                     # This means that proposer has proposed n which is greater than acceptor's n.
                     # print(f'DROPED', end=" | ")                    
+                    if self.metrics is not None:
+                        self.metrics.count('dropped.PROMISE')
                     return
                 else:
                     # This means that acceptor has seen n which is greater than proposer's n.
                     # print(f'DROPED', end=" | ")
+                    if self.metrics is not None:
+                        self.metrics.count('dropped.PROMISE')
                     return                
             
             if message.type == MessageType.ACCEPT:            
@@ -147,29 +309,45 @@ class Network:
                         return
                     computer.addVote(MessageType.ACCEPTED, message.source)
                     if computer.hasMajority(MessageType.ACCEPTED):
-                        result = f'{computer} has reached consensus (proposed {computer.getValue(MessageType.PROPOSE)}, accepted {computer.acceptedBy[computer.getN()][0].getValue()})'
-                        CONSENSUS_REACHED.append(result)
+                        if self.metrics is not None:
+                            self.metrics.endPhase('accept', computer, computer.getN(), self.currentTick)
+                        self.consensusReached.append((computer, computer.getValue(MessageType.PROPOSE), computer.acceptedBy.first.getValue()))
                     return
                 elif computer.getN() > message.source.getN():   
                     # This means that proposer has proposed n which is greater than acceptor's n.
                     # print(f'DROPED', end=" | ")
+                    if self.metrics is not None:
+                        self.metrics.count('dropped.ACCEPTED')
                     return
                 else:
                     # This means that acceptor has seen n which is greater than proposer's n.
                     # print(f'DROPED', end=" | ")
+                    if self.metrics is not None:
+                        self.metrics.count('dropped.ACCEPTED')
 
                     # # We will create an new Event so that the Proposer will be triggered by
                     # # external source with a new higher n and try to reach consensus
                     if computer.hasMajority(MessageType.ACCEPTED):
                         return
                         
-                    for events in EVENTS:
-                        if events.request == computer:
-                            return
-                    EVENTS.append(Event(None, None, None, computer, computer.getValue()))
+                    if self.events.hasPendingRequest(computer):
+                        return
+                    self.events.append(Event(None, None, None, computer, computer.getValue()))
                     return
+
+            if message.type == MessageType.REJECTED:
+                # The acceptor has seen a higher n than this proposer's: try again with a new one,
+                # unless this round is decided already or the proposer moved past that n
+                if not self.retryOnRejected or computer.hasMajority(MessageType.ACCEPTED) or computer.getN() >= message.source.getN():
+                    return
+                if self.events.hasPendingRequest(computer):
+                    return
+                self.events.append(Event(None, None, None, computer, computer.getValue()))
+                return
                 
         except Exception as ex:
-            print(f'Exception: {ex}', end=" | ")
+            self.trace.log(ERROR, 'Exception: {}', ex, end=' | ')
         finally:
+            if self.metrics is not None:
+                self.metrics.count(f'delivered.{message.type.name}')
             self.printMessage(computer, message)
@@ -0,0 +1,184 @@
+import os
+import mmap
+import struct
+from typing import Dict, Iterator, List, Tuple
+from network import Network, Event
+from model import Computers, Proposers, Acceptors, Message, MessageType, Record, Storage, DataBase, checkIntValue
+from scheduler import EventScheduler
+from simulation import SimulationRun, SimulationResult
+from config import WAL_GROUP_COMMIT
+
+# Every WAL entry is a 4-byte length followed by the record: message type, source kind and id,
+# destination kind and id, n, value and log slot. Kinds are 0 for a Proposer, 1 for an Acceptor
+# and 2 for no computer (the source of a PROPOSE); a missing n, value or slot is written as NONE.
+# A batch of commands (a Multi-Paxos value) is written as a NONE value followed by the commands,
+# which the length of the entry accounts for.
+LENGTH = struct.Struct('!I')
+RECORD = struct.Struct('!BBHBHqqq')
+COMMAND = struct.Struct('!q')
+NONE = -2 ** 63
+
+def _kind(computer: Computers) -> Tuple[int, int]:
+    if computer is None:
+        return 2, 0
+    return (0 if isinstance(computer, Proposers) else 1), computer.id
+
+def _orNone(number: int) -> int:
+    return NONE if number is None else number
+
+def encodeRecord(record: Record) -> bytes:
+    batch = isinstance(record.value, tuple)
+    payload = RECORD.pack(record.messageType.value, *_kind(record.source), *_kind(record.destination),
+                          _orNone(record.n), NONE if batch else _orNone(record.value), _orNone(record.slot))
+    if batch:
+        payload += struct.pack(f'!{len(record.value)}q', *record.value)
+    return LENGTH.pack(len(payload)) + payload
+
+def _syncDirectory(path: str) -> None:
+    # Makes a rename in the directory of path durable, which fsyncing the file alone does not
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+class WriteAheadLog:
+    # Append-only, length-prefixed log of one computer's records. Appends are buffered and made
+    # durable together by a single write and fsync (group commit) once groupCommit records are
+    # waiting, or whenever sync() is called. Replay reads the file through a read-only mmap and
+    # stops at a torn entry at the tail.
+    def __init__(self, path: str, groupCommit: int = WAL_GROUP_COMMIT) -> None:
+        self.path = path
+        self.groupCommit = groupCommit
+        self.file = open(path, 'ab')
+        self.buffer = bytearray()
+        self.unsynced = 0
+        self.syncs = 0
+        self.snapshots = 0
+
+    def append(self, record: Record) -> None:
+        self.buffer += encodeRecord(record)
+        self.unsynced += 1
+        if self.unsynced >= self.groupCommit:
+            self.sync()
+
+    def sync(self) -> None:
+        if not self.buffer:
+            return
+        self.file.write(self.buffer)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.buffer.clear()
+        self.unsynced = 0
+        self.syncs += 1
+
+    def rewrite(self, records: List[Record]) -> None:
+        # Replaces the whole log with a snapshot of records; the new file is made durable
+        # before it atomically takes the place of the old one, and the rename after that
+        self.buffer.clear()
+        self.unsynced = 0
+        snapshotPath = self.path + '.snapshot'
+        with open(snapshotPath, 'wb') as file:
+            for record in records:
+                file.write(encodeRecord(record))
+            file.flush()
+            os.fsync(file.fileno())
+        self.file.close()
+        os.replace(snapshotPath, self.path)
+        _syncDirectory(self.path)
+        self.file = open(self.path, 'ab')
+        self.snapshots += 1
+
+    def discardUnsynced(self) -> None:
+        # A crash loses whatever was not fsynced yet
+        self.buffer.clear()
+        self.unsynced = 0
+
+    def replay(self) -> Iterator[Tuple]:
+        # Yields (messageType, srcKind, srcId, dstKind, dstId, n, value, slot) for every durable entry
+        if os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset + LENGTH.size <= len(data):
+                length, = LENGTH.unpack_from(data, offset)
+                if offset + LENGTH.size + length > len(data):
+                    break
+                messageType, srcKind, srcId, dstKind, dstId, n, value, slot = RECORD.unpack_from(data, offset + LENGTH.size)
+                if length > RECORD.size:
+                    value = struct.unpack_from(f'!{(length - RECORD.size) // COMMAND.size}q', data, offset + LENGTH.size + RECORD.size)
+                elif value == NONE:
+                    value = None
+                yield MessageType(messageType), srcKind, srcId, dstKind, dstId, None if n == NONE else n, value, None if slot == NONE else slot
+                offset += LENGTH.size + length
+
+    def close(self) -> None:
+        self.sync()
+        self.file.close()
+
+class DurableNetwork(Network):
+    # Acceptors write every record to their own WriteAheadLog, and all logs are group-committed
+    # at each tick on top of their own size-based commits. A failed acceptor is a crashed one:
+    # when it recovers, its memory is rebuilt from what its log made durable, and so is the
+    # memory of every acceptor when a run starts on logs left by an earlier one.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, events: EventScheduler = None, database: DataBase = None) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, events, database)
+        self.logs: Dict[Acceptors, WriteAheadLog] = {}
+
+    def attachLogs(self, directory: str, groupCommit: int = WAL_GROUP_COMMIT) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for acceptor in self.acceptors:
+            self.logs[acceptor] = WriteAheadLog(os.path.join(directory, f'{acceptor}.wal'), groupCommit)
+            self._restore(acceptor)
+
+    def closeLogs(self) -> None:
+        for log in self.logs.values():
+            log.close()
+
+    def _resolve(self, kind: int, id: int) -> Computers:
+        if kind == 2:
+            return None
+        return self.getComputerById(Proposers if kind == 0 else Acceptors, id)
+
+    def _restore(self, acceptor: Acceptors) -> None:
+        log = self.logs[acceptor]
+        storage = Storage(acceptor.internalState.database, log, acceptor.internalState.snapshotInterval)
+        for messageType, srcKind, srcId, dstKind, dstId, n, value, slot in log.replay():
+            storage.loadRecord(Record(self._resolve(srcKind, srcId), self._resolve(dstKind, dstId), messageType, n, value, None, slot))
+        acceptor.internalState = storage
+        # The highest n it promised or accepted, and the value of its last ACCEPT
+        n, _ = storage.getMaxNAndValue()
+        acceptor.setN(max(1, n))
+        lastAccept = storage.getLastRecord(MessageType.ACCEPT)
+        acceptor.setValue(lastAccept.value if lastAccept else None)
+
+    def onTick(self, tick: int) -> None:
+        super().onTick(tick)
+        for log in self.logs.values():
+            log.sync()
+
+    def DeliverMessage(self, computer: Computers, message: Message) -> None:
+        if message.type == MessageType.PROPOSE:
+            checkIntValue(computer.getValue(), 'The write-ahead log')
+        super().DeliverMessage(computer, message)
+
+    def setFailed(self, computer: Computers, failed: bool) -> None:
+        if computer in self.logs and computer.failed != failed:
+            if failed:
+                self.logs[computer].discardUnsynced()
+            else:
+                self._restore(computer)
+        super().setFailed(computer, failed)
+
+class DurableRun(SimulationRun):
+    NETWORK = DurableNetwork
+
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, maxSimulationDuration: int, eventsList: List[Event], directory: str, seed: int = None, groupCommit: int = WAL_GROUP_COMMIT) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, maxSimulationDuration, eventsList, seed)
+        self.network.attachLogs(directory, groupCommit)
+
+    def simulate(self) -> SimulationResult:
+        try:
+            return super().simulate()
+        finally:
+            self.network.closeLogs()
@@ -0,0 +1,122 @@
+from typing import Dict
+
+# A set of acceptors is an int with bit id set for every acceptor in it, so adding a vote is an
+# OR and counting votes is a popcount, however many acceptors there are.
+
+def bit(acceptor) -> int:
+    return 1 << acceptor.id
+
+class ThresholdQuorum:
+    # Any phase1 acceptors form a Phase-1 quorum (enough PROMISEs) and any phase2 a Phase-2 one
+    # (enough ACCEPTEDs). Safe as long as every Phase-1 quorum meets every Phase-2 quorum, that is
+    # phase1 + phase2 > the number of acceptors.
+    def __init__(self, phase1: int, phase2: int = None) -> None:
+        self.phase1 = phase1
+        self.phase2 = phase2 if phase2 is not None else phase1
+
+    def __str__(self) -> str:
+        return f'threshold({self.phase1}, {self.phase2})'
+
+    def isPhase1Quorum(self, votes: int) -> bool:
+        return votes.bit_count() >= self.phase1
+
+    def isPhase2Quorum(self, votes: int) -> bool:
+        return votes.bit_count() >= self.phase2
+
+class MajorityQuorum(ThresholdQuorum):
+    # Classic Paxos: more than half of the acceptors, in both phases
+    def __init__(self, noOfAcceptors: int) -> None:
+        super().__init__(noOfAcceptors // 2 + 1)
+
+    def __str__(self) -> str:
+        return f'majority({self.phase1})'
+
+class FlexibleQuorum(ThresholdQuorum):
+    # Flexible Paxos: Phase 2 only needs phase2 acceptors, and Phase 1 makes up for it with
+    # noOfAcceptors - phase2 + 1, just enough to meet every Phase-2 quorum. Phase 2 runs once per
+    # value and Phase 1 only when the leader changes, so a small phase2 cuts the common case.
+    def __init__(self, noOfAcceptors: int, phase2: int) -> None:
+        if not 1 <= phase2 <= noOfAcceptors:
+            raise ValueError(f'a Phase-2 quorum of {phase2} out of {noOfAcceptors} acceptors')
+        super().__init__(noOfAcceptors - phase2 + 1, phase2)
+
+    def __str__(self) -> str:
+        return f'flexible({self.phase1}, {self.phase2})'
+
+class WeightedQuorum:
+    # Every acceptor votes with its weight (1 if it has none); a quorum of either phase holds more
+    # than half of the total weight
+    def __init__(self, weights: Dict[int, int], noOfAcceptors: int) -> None:
+        self.weights = {id: weights.get(id, 1) for id in range(1, noOfAcceptors + 1)}
+        self.total = sum(self.weights.values())
+
+    def __str__(self) -> str:
+        return f'weighted({self.total})'
+
+    def weight(self, votes: int) -> int:
+        total = 0
+        while votes:
+            lowest = votes & -votes
+            total += self.weights.get(lowest.bit_length() - 1, 0)
+            votes ^= lowest
+        return total
+
+    def isPhase1Quorum(self, votes: int) -> bool:
+        return 2 * self.weight(votes) > self.total
+
+    def isPhase2Quorum(self, votes: int) -> bool:
+        return 2 * self.weight(votes) > self.total
+
+class GridQuorum:
+    # The acceptors laid out row by row on a rows x columns grid, A1 top left. A Phase-1 quorum is
+    # one full row and a Phase-2 quorum one full column; every row crosses every column, so they
+    # always meet. With more columns than rows a Phase-2 quorum is the smaller of the two.
+    def __init__(self, rows: int, columns: int) -> None:
+        self.rows = rows
+        self.columns = columns
+        self.rowMasks = [sum(1 << (row * columns + column + 1) for column in range(columns)) for row in range(rows)]
+        self.columnMasks = [sum(1 << (row * columns + column + 1) for row in range(rows)) for column in range(columns)]
+
+    def __str__(self) -> str:
+        return f'grid({self.rows}x{self.columns})'
+
+    def isPhase1Quorum(self, votes: int) -> bool:
+        return any(votes & mask == mask for mask in self.rowMasks)
+
+    def isPhase2Quorum(self, votes: int) -> bool:
+        return any(votes & mask == mask for mask in self.columnMasks)
+
+class Votes:
+    # The acceptors that voted in a proposer's current round (its n), and which of them voted
+    # first. A vote for a higher n starts a new round and drops the old one; a vote for a lower n
+    # has no round left to count in. An acceptor voting twice in a round is counted once.
+    __slots__ = ('n', 'voters', 'first')
+
+    def __init__(self) -> None:
+        self.n = None
+        self.voters = 0
+        self.first = None
+
+    def add(self, n: int, acceptor) -> None:
+        if n != self.n:
+            if self.n is not None and n < self.n:
+                return
+            self.n = n
+            self.voters = 0
+            self.first = acceptor
+        self.voters |= bit(acceptor)
+
+    def get(self, n: int) -> int:
+        # The voters of round n, 0 if that is not the current round
+        return self.voters if n == self.n and n is not None else 0
+
+    def __contains__(self, n: int) -> bool:
+        return n == self.n and n is not None
+
+    def __len__(self) -> int:
+        return self.voters.bit_count()
+
+    def copy(self) -> 'Votes':
+        votes = Votes()
+        votes.n, votes.voters, votes.first = self.n, self.voters, self.first
+        return votes
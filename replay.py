@@ -0,0 +1,287 @@
+import os
+import time
+import bisect
+import argparse
+from typing import BinaryIO, Dict, List, Tuple
+from network import Network
+from model import Computers, Proposers, Message, MessageType, Propose, checkIntValue
+from tracing import Trace, QUIET, DEBUG
+from config import TRACE_BUFFER, REPLAY_CHECKPOINT_INTERVAL
+
+# A run trace is a header (MAGIC, then the number of proposers and of acceptors) followed by one
+# record per decision the run made, in order. Every field is an unsigned LEB128 varint:
+#   tick delta, kind, then for a delivered message: source, destination, n, value
+#                          for a failure or recovery: computer
+# The tick delta is counted from the previous record. The kind is the message type, or FAIL or
+# RECOVER. A computer is written as 3 * id + kind, where kind is 0 for a Proposer, 1 for an
+# Acceptor and 2 for no computer (the source of a PROPOSE). n and value are what the sender held
+# at delivery (for a PROPOSE, what the proposer was handed); None is 0, anything else is its
+# zigzag encoding plus one.
+MAGIC = b'PXTR1'
+FAIL, RECOVER = 7, 8
+
+def _computer(computer: Computers) -> int:
+    if computer is None:
+        return 2
+    return 3 * computer.id + (0 if isinstance(computer, Proposers) else 1)
+
+def _optional(number: int) -> int:
+    if number is None:
+        return 0
+    return (number << 1 if number >= 0 else ~number << 1 | 1) + 1
+
+def _fromOptional(encoded: int) -> int:
+    if encoded == 0:
+        return None
+    encoded -= 1
+    return ~(encoded >> 1) if encoded & 1 else encoded >> 1
+
+def _varint(buffer: bytearray, number: int) -> None:
+    while number > 0x7f:
+        buffer.append(number & 0x7f | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+class TraceWriter:
+    # Records a run as it happens, attached as network.recorder: the network hands it every
+    # message it delivers and every failure and recovery. Records are encoded into a buffer that
+    # is written to file whenever it grows past bufferSize bytes, and by flush(). Only runs of
+    # the single-synod handlers (SimulationRun, ConcurrentRun) can be replayed.
+    def __init__(self, file: BinaryIO, noOfProposers: int, noOfAcceptors: int, bufferSize: int = TRACE_BUFFER) -> None:
+        self.file = file
+        self.bufferSize = bufferSize
+        self.buffer = bytearray(MAGIC)
+        _varint(self.buffer, noOfProposers)
+        _varint(self.buffer, noOfAcceptors)
+        self.tick = 0
+        self.records = 0
+
+    def _start(self, tick: int, kind: int) -> None:
+        _varint(self.buffer, tick - self.tick)
+        _varint(self.buffer, kind)
+        self.tick = tick
+        self.records += 1
+
+    def deliver(self, tick: int, message: Message) -> None:
+        sender = message.destination if message.type == MessageType.PROPOSE else message.source
+        if message.type == MessageType.PROPOSE:
+            checkIntValue(sender.getValue(), 'A replay trace', bounded=False)
+        self._start(tick, message.type.value)
+        _varint(self.buffer, _computer(message.source))
+        _varint(self.buffer, _computer(message.destination))
+        _varint(self.buffer, _optional(sender.getN()))
+        _varint(self.buffer, _optional(sender.getValue()))
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def setFailed(self, tick: int, computer: Computers, failed: bool) -> None:
+        self._start(tick, FAIL if failed else RECOVER)
+        _varint(self.buffer, _computer(computer))
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+class _NoRetries:
+    # Retries show up in a trace as the PROPOSEs they led to, so a replay has nothing to schedule
+    def __len__(self) -> int:
+        return 0
+
+    def append(self, event) -> None:
+        return
+
+    def hasPendingRequest(self, computer: Computers) -> bool:
+        return False
+
+class ReplayNetwork(Network):
+    # The single-synod network without a queue: a replay hands it each message the trace says was
+    # delivered, so whatever the handlers queue in response is only counted. Storage is never
+    # compacted, which changes nothing any lookup returns, so checkpoints can roll it back by length.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, _NoRetries())
+        self.trace = Trace(QUIET)
+        self.queued = 0
+        for computer in self.getComputers():
+            computer.internalState.snapshotInterval = None
+
+    def QueueMessage(self, message: Message) -> None:
+        self.queued += 1
+
+class TraceReplay:
+    # Re-runs a recorded trace through the protocol handlers. Nothing is drawn from an RNG and
+    # nothing is picked from a queue: every record says which message to deliver or which computer
+    # to fail or recover. Before each delivery the sender's n and value are checked against the
+    # recorded ones, and a mismatch (a trace from different code, or a corrupt one) raises
+    # ValueError. On the way through, the state before the first record of every
+    # checkpointInterval ticks is kept as a checkpoint, so seek() can go back to any tick
+    # already passed by restoring the checkpoint before it and replaying only from there.
+    # A checkpoint holds the length of every computer's Storage rather than a copy of it, and
+    # restoring one truncates the records added since. Replay is deterministic, so a checkpoint
+    # is still right once the replay passes it again, but it can only take the replay back.
+    def __init__(self, data: bytes, checkpointInterval: int = REPLAY_CHECKPOINT_INTERVAL) -> None:
+        if not data.startswith(MAGIC):
+            raise ValueError('not a run trace')
+        self.data = data
+        self.offset = len(MAGIC)
+        noOfProposers = self._read()
+        noOfAcceptors = self._read()
+        self.network = ReplayNetwork(noOfProposers, noOfAcceptors)
+        self.computers: Dict[int, Computers] = {_computer(computer): computer for computer in self.network.getComputers()}
+        self.computers[_computer(None)] = None
+        # Tick of the last record applied, and how many have been
+        self.tick = 0
+        self.records = 0
+        self.checkpointInterval = checkpointInterval
+        # Checkpoint ticks, and (offset, tick, state) of each: where in the trace its first record
+        # starts and the replay as it was just before it
+        self.checkpointTicks: List[int] = []
+        self.checkpoints: List[Tuple[int, int, Tuple]] = []
+        self._checkpoint(0)
+
+    @classmethod
+    def load(cls, path: str, checkpointInterval: int = REPLAY_CHECKPOINT_INTERVAL) -> 'TraceReplay':
+        with open(path, 'rb') as file:
+            return cls(file.read(), checkpointInterval)
+
+    def _read(self) -> int:
+        data, offset = self.data, self.offset
+        number = shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            number |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                self.offset = offset
+                return number
+            shift += 7
+
+    def nextTick(self) -> int:
+        # Tick of the next record, or None at the end of the trace
+        if self.offset >= len(self.data):
+            return None
+        offset = self.offset
+        delta = self._read()
+        self.offset = offset
+        return self.tick + delta
+
+    def _checkpoint(self, tick: int) -> None:
+        network = self.network
+        computers = tuple((computer.failed, computer.n, computer.value, computer.internalState.mark()) for computer in network.getComputers())
+        votes = tuple((proposer.consensus, proposer.promisedBy.copy(), proposer.acceptedBy.copy()) for proposer in network.proposers)
+        state = (computers, votes, list(network.consensusReached), network.queued, self.records)
+        self.checkpointTicks.append(tick)
+        self.checkpoints.append((self.offset, self.tick, state))
+
+    def _restore(self, index: int) -> None:
+        network = self.network
+        self.offset, self.tick, (computers, votes, consensusReached, network.queued, self.records) = self.checkpoints[index]
+        for computer, (failed, n, value, mark) in zip(network.getComputers(), computers):
+            computer.failed, computer.n, computer.value = failed, n, value
+            computer.internalState.truncate(mark)
+        for proposer, (consensus, promisedBy, acceptedBy) in zip(network.proposers, votes):
+            proposer.consensus = consensus
+            proposer.promisedBy, proposer.acceptedBy = promisedBy.copy(), acceptedBy.copy()
+        network.consensusReached = list(consensusReached)
+
+    def step(self) -> bool:
+        # Applies the next record; False at the end of the trace
+        if self.offset >= len(self.data):
+            return False
+        start = self.offset
+        tick = self.tick + self._read()
+        if self.checkpointInterval and tick // self.checkpointInterval > self.checkpointTicks[-1] // self.checkpointInterval:
+            self.offset = start
+            self._checkpoint(tick)
+            self._read()
+        network = self.network
+        if tick != self.tick or self.records == 0:
+            network.onTick(tick)
+        self.tick = tick
+        kind = self._read()
+        if kind == FAIL or kind == RECOVER:
+            network.setFailed(self.computers[self._read()], kind == FAIL)
+        else:
+            messageType = MessageType(kind)
+            source = self.computers[self._read()]
+            destination = self.computers[self._read()]
+            n, value = _fromOptional(self._read()), _fromOptional(self._read())
+            if messageType == MessageType.PROPOSE:
+                # As SimulationRun._propose does it
+                destination.setN(n)
+                destination.setValue(value)
+                message = Propose(src=None, dst=destination)
+                destination.saveMessage(message)
+            else:
+                if source.getN() != n or source.getValue() != value:
+                    raise ValueError(f'replay diverged at tick {tick}: {source} holds n={source.getN()}, v={source.getValue()}, trace says n={n}, v={value}')
+                message = Message(source, destination, messageType)
+            network.DeliverMessage(destination, message)
+        self.records += 1
+        return True
+
+    def seek(self, tick: int) -> None:
+        # Leaves the replay at the start of tick: every record before it applied, none from it on.
+        # Goes back to the last checkpoint before tick if the replay is already past it
+        if self.records and self.tick >= tick:
+            self._restore(bisect.bisect_right(self.checkpointTicks, tick) - 1)
+        while True:
+            next = self.nextTick()
+            if next is None or next >= tick:
+                return
+            self.step()
+
+    def run(self) -> None:
+        while self.step():
+            pass
+
+def recordRun(simulation, file: BinaryIO) -> TraceWriter:
+    # Attaches a TraceWriter writing to file to the simulation's network
+    network = simulation.network
+    network.recorder = TraceWriter(file, len(network.proposers), len(network.acceptors))
+    return network.recorder
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Record a seeded random single-synod run to a binary trace, or replay one')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record = subparsers.add_parser('record')
+    record.add_argument('path')
+    record.add_argument('--proposers', type=int, default=2)
+    record.add_argument('--tolerance', type=int, default=1)
+    record.add_argument('--failures', type=int, default=2, help='failure/recovery pairs')
+    record.add_argument('--seed', type=int, default=0)
+    play = subparsers.add_parser('replay')
+    play.add_argument('path')
+    play.add_argument('--to', type=int, default=None, help='stop at the start of this tick')
+    play.add_argument('--verbose', action='store_true', help='print every message delivered')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from sweep import randomScenario
+        from simulation import SimulationRun
+        scenario = randomScenario(args.proposers, args.tolerance, args.seed, args.failures)
+        simulation = SimulationRun(scenario.noOfProposers, scenario.noOfAcceptors, scenario.maxDuration, scenario.events, scenario.seed)
+        simulation.network.trace.level = QUIET
+        with open(args.path, 'wb') as file:
+            recorder = recordRun(simulation, file)
+            result = simulation.simulate()
+        print(f'{recorder.records} records, {os.path.getsize(args.path)} bytes, {result.ticks} ticks, consensus {result.consensusReached}')
+    else:
+        replay = TraceReplay.load(args.path)
+        if args.verbose:
+            replay.network.trace = Trace(DEBUG)
+        start = time.perf_counter()
+        if args.to is None:
+            replay.run()
+        else:
+            replay.seek(args.to)
+        elapsed = time.perf_counter() - start
+        replay.network.trace.flush()
+        network = replay.network
+        print(f'{replay.records} records up to tick {replay.tick} in {elapsed:.3f}s')
+        for computer in network.getComputers():
+            print(f'  {computer}: n={computer.getN()}, v={computer.getValue()}{" (failed)" if computer.failed else ""}')
+        for proposer, proposed, accepted in network.consensusReached:
+            print(f'{proposer} has reached consensus (proposed {proposed}, accepted {accepted})')
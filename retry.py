@@ -0,0 +1,29 @@
+from model import Proposers
+
+class FlatRetry:
+    # Every retry waits 0 to maxDelay - 1 ticks, however often the proposer has lost before
+    def __init__(self, maxDelay: int = 6) -> None:
+        self.maxDelay = maxDelay
+
+    def __str__(self) -> str:
+        return f'flat({self.maxDelay})'
+
+    def delay(self, proposer: Proposers, attempt: int, rng) -> int:
+        return rng.randrange(self.maxDelay)
+
+class ExponentialBackoff:
+    # Retry number attempt waits 0 to min(cap, base * 2^(attempt - 1)) ticks, drawn uniformly
+    # (full jitter), so proposers that keep colliding spread further apart every time.
+    # With a leader hint, the proposer with that id retries at once and only the others back off.
+    def __init__(self, base: int = 2, cap: int = 64, leader: int = None) -> None:
+        self.base = base
+        self.cap = cap
+        self.leader = leader
+
+    def __str__(self) -> str:
+        return f'backoff({self.base}, {self.cap})' + (f' leader P{self.leader}' if self.leader is not None else '')
+
+    def delay(self, proposer: Proposers, attempt: int, rng) -> int:
+        if proposer.id == self.leader:
+            return 0
+        return rng.randint(0, min(self.cap, self.base * 2 ** (attempt - 1)))
@@ -0,0 +1,113 @@
+import csv
+import json
+from typing import Dict, Iterator, List, Tuple
+from network import Network, Event
+from model import Computers, Proposers, Acceptors
+from config import NO_OF_PROPOSERS, NO_OF_ACCEPTORS, MAX_DURATION
+
+# Scenario files describe a run as data instead of EVENTS.append(...) calls in main.py. In JSON
+# Lines, one object per line; the first may give the cluster, and every other one is an Event:
+#
+#   {"proposers": 2, "acceptors": 3, "duration": 90}
+#   {"tick": 0, "propose": "P1", "value": 42}
+#   {"tick": 8, "fail": ["P1"]}
+#   {"tick": 26, "recover": ["P1", "A2"]}
+#
+# A .csv file has the columns tick, fail, recover, propose and value, computers in a list split by
+# spaces, and optionally proposers, acceptors, duration and seed, filled in on a first row of their own.
+# Empty fields, blank lines and JSON Lines starting with # are ignored. Events must come in tick
+# order, so that a run can read them as it gets to them rather than all at once.
+
+KINDS = {'P': Proposers, 'A': Acceptors}
+CLUSTER = ('proposers', 'acceptors', 'duration', 'seed')
+
+def _records(path: str) -> Iterator[Tuple[int, Dict]]:
+    # (line number, fields) of every record in the file, read one at a time
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            reader = csv.DictReader(file, skipinitialspace=True)
+            for record in reader:
+                yield reader.line_num, {key: value for key, value in record.items() if key and value}
+            return
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield number, json.loads(line)
+
+def _computer(name: str) -> Tuple[type, int]:
+    # 'P1' -> (Proposers, 1)
+    if not isinstance(name, str) or name[:1] not in KINDS or not name[1:].isdigit():
+        raise ValueError(f'{name!r} is not a computer, like P1 or A3')
+    return KINDS[name[0]], int(name[1:])
+
+def _computers(names) -> List[Tuple[type, int]]:
+    return [_computer(name) for name in (names.split() if isinstance(names, str) else names)]
+
+def _value(value):
+    # CSV fields are strings: numbers become ints, anything else (lease.READ) is kept as it is
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    return value
+
+class ScenarioFile:
+    # A scenario on disk. The cluster comes from the first record (config.py's defaults for what it
+    # leaves out, and seed for the retry delays, None if it has none). A first pass over the file
+    # counts the Events and the requests of every proposer, in memory that grows only with the
+    # proposers; events() then streams the Events, resolved against a network as they are read.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        cluster = {}
+        self.noOfEvents = 0
+        # Requests per proposer id, so a stream counts every later request as pending as a list does
+        self.requestsById: Dict[int, int] = {}
+        for index, (_, record) in enumerate(_records(path)):
+            if 'tick' not in record:
+                if index == 0:
+                    cluster = record
+                continue
+            self.noOfEvents += 1
+            if 'propose' in record:
+                _, id = _computer(record['propose'])
+                self.requestsById[id] = self.requestsById.get(id, 0) + 1
+        self.noOfProposers = int(cluster.get('proposers', NO_OF_PROPOSERS))
+        self.noOfAcceptors = int(cluster.get('acceptors', NO_OF_ACCEPTORS))
+        self.maxDuration = int(cluster.get('duration', MAX_DURATION))
+        self.seed = int(cluster['seed']) if 'seed' in cluster else None
+
+    def __len__(self) -> int:
+        return self.noOfEvents
+
+    def requests(self, network: Network) -> Dict[Computers, int]:
+        # Requests of every proposer of network over the whole file
+        return {network.getComputerById(Proposers, id): count for id, count in self.requestsById.items()}
+
+    def _resolve(self, network: Network, number: int, names) -> List[Computers]:
+        computers = []
+        for computerType, id in _computers(names):
+            computer = network.getComputerById(computerType, id)
+            if computer is None:
+                raise ValueError(f'{self.path}:{number}: no {computerType.__name__}({id}) on this network')
+            computers.append(computer)
+        return computers
+
+    def events(self, network: Network) -> Iterator[Event]:
+        # Every Event of the file in tick order, pointing at network's own computers
+        last = None
+        for index, (number, record) in enumerate(_records(self.path)):
+            if 'tick' not in record:
+                if index > 0 or any(key not in CLUSTER for key in record):
+                    raise ValueError(f'{self.path}:{number}: an event needs a tick')
+                continue
+            tick = int(record['tick'])
+            if last is not None and tick < last:
+                raise ValueError(f'{self.path}:{number}: tick {tick} comes after tick {last}')
+            last = tick
+            failure = self._resolve(network, number, record['fail']) if 'fail' in record else None
+            recovery = self._resolve(network, number, record['recover']) if 'recover' in record else None
+            request = self._resolve(network, number, [record['propose']])[0] if 'propose' in record else None
+            if request is not None and not isinstance(request, Proposers):
+                raise ValueError(f'{self.path}:{number}: only proposers propose')
+            yield Event(tick, failure, recovery, request, _value(record.get('value')))
@@ -0,0 +1,106 @@
+import heapq
+import random
+from itertools import count
+from typing import Dict, Iterable, Iterator, List, Tuple
+from model import Computers
+from retry import FlatRetry
+
+class EventScheduler:
+    # Pending Events kept in a heap keyed on (tick, arrival order), so the simulation can pop
+    # the next due Event in O(log n) and jump straight to it instead of visiting every tick.
+    # Events queued with tick=None (a Proposer re-trying after losing a round) are held aside
+    # until the next tick starts, when the retry policy delays them (0-5 random ticks by default).
+    def __init__(self, events: Iterable = (), rng: random.Random = None, retryPolicy=None) -> None:
+        # Retry delays come from rng, or the module-level random generator if none is given
+        self.rng = rng if rng is not None else random
+        self.retryPolicy = retryPolicy if retryPolicy is not None else FlatRetry()
+        # Retries scheduled so far per Proposer
+        self.retries: Dict[Computers, int] = {}
+        self.sequence = count()
+        self.heap: List[Tuple[int, int, object]] = []
+        self.deferred: List = []
+        self.requests: Dict[Computers, int] = {}
+        # Events streamed in tick order (see stream), the next one of them and how many are left
+        self.source: Iterator = iter(())
+        self.upcoming = None
+        self.streamed = 0
+        for event in events:
+            self.append(event)
+
+    def __len__(self) -> int:
+        return len(self.heap) + len(self.deferred) + self.streamed
+
+    def __iter__(self):
+        # Of a stream, only the next Event is known
+        upcoming = self.upcoming
+        for tick, _, event in sorted(self.heap):
+            if upcoming is not None and upcoming.tick <= tick:
+                yield upcoming
+                upcoming = None
+            yield event
+        if upcoming is not None:
+            yield upcoming
+        yield from self.deferred
+
+    def stream(self, events: Iterable, noOfEvents: int, requests: Dict[Computers, int]) -> None:
+        # Takes noOfEvents Events in tick order (from a scenario.ScenarioFile, say) one at a time as
+        # the simulation gets to them, instead of loading them all into the heap: only the next one
+        # is held. It goes before anything else due at its tick, as it would have if it had been
+        # appended first. requests counts the requests of every Proposer among them, so that
+        # hasPendingRequest sees the ones further down the stream just as if they had been appended.
+        self.source = iter(events)
+        self.upcoming = next(self.source, None)
+        self.streamed = noOfEvents if self.upcoming is not None else 0
+        for computer, requests in requests.items():
+            self.requests[computer] = self.requests.get(computer, 0) + requests
+
+    def append(self, event) -> None:
+        if event.request:
+            self.requests[event.request] = self.requests.get(event.request, 0) + 1
+        if event.tick is None:
+            self.deferred.append(event)
+        else:
+            heapq.heappush(self.heap, (event.tick, next(self.sequence), event))
+
+    def hasPendingRequest(self, computer: Computers) -> bool:
+        return self.requests.get(computer, 0) > 0
+
+    def popRequest(self, computer: Computers):
+        # Removes and returns the first deferred Event requested by computer, or None
+        for index, event in enumerate(self.deferred):
+            if event.request is computer:
+                del self.deferred[index]
+                self.requests[computer] -= 1
+                return event
+        return None
+
+    def resolveDeferred(self, tick: int) -> None:
+        # Schedules every deferred Event relative to the tick that is about to start
+        for event in self.deferred:
+            self.retries[event.request] = self.retries.get(event.request, 0) + 1
+            event.tick = tick + self.retryPolicy.delay(event.request, self.retries[event.request], self.rng)
+            heapq.heappush(self.heap, (event.tick, next(self.sequence), event))
+        self.deferred.clear()
+
+    def nextTick(self) -> int:
+        # Tick of the earliest scheduled Event, or None if nothing is scheduled
+        if self.upcoming is not None and (not self.heap or self.upcoming.tick <= self.heap[0][0]):
+            return self.upcoming.tick
+        return self.heap[0][0] if self.heap else None
+
+    def popDue(self, tick: int):
+        # Removes and returns one Event scheduled at or before tick, or None.
+        # Only one Event is handled per tick; any others due at the same tick follow on the next ones.
+        if self.upcoming is not None and self.upcoming.tick <= tick and (not self.heap or self.upcoming.tick <= self.heap[0][0]):
+            event = self.upcoming
+            self.upcoming = next(self.source, None)
+            self.streamed = self.streamed - 1 if self.upcoming is not None else 0
+            if event.request:
+                self.requests[event.request] -= 1
+            return event
+        if not self.heap or self.heap[0][0] > tick:
+            return None
+        _, _, event = heapq.heappop(self.heap)
+        if event.request:
+            self.requests[event.request] -= 1
+        return event
@@ -0,0 +1,138 @@
+from random import Random
+from typing import List, NamedTuple, Tuple
+from network import Network, Event
+from scheduler import EventScheduler
+from model import DataBase, Proposers, Propose
+from tracing import INFO, DEBUG
+from config import MASTER_TABLE_LIMIT
+
+class SimulationResult(NamedTuple):
+    # Consensus reached during the run, as (proposer id, proposed value, accepted value)
+    consensusReached: List[Tuple[int, int, int]]
+    # Ids of proposers that proposed a value but never reached consensus
+    undecided: List[int]
+    # Tick at which the simulation stopped
+    ticks: int
+    # True if the simulation ran out of ticks rather than running out of work
+    timedOut: bool
+
+    def agreement(self) -> bool:
+        # Safety: every proposer that reached consensus saw the same accepted value
+        return len({accepted for _, _, accepted in self.consensusReached}) <= 1
+
+class SimulationRun:
+    # One single-synod simulation. All of its state (network, pending events, master table,
+    # proposal numbers, retry RNG) belongs to the instance, so any number of runs can live
+    # side by side in one process, and simulate() returns a SimulationResult instead of exiting.
+    NETWORK = Network
+
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, maxSimulationDuration: int, eventsList: List[Event], seed: int = None, maxRecords: int = MASTER_TABLE_LIMIT, retryPolicy=None) -> None:
+        # All computers are connected to the network
+        self.database = DataBase(maxRecords)
+        self.events = EventScheduler(eventsList, Random(seed) if seed is not None else None, retryPolicy)
+        self.network = self.NETWORK(noOfProposers, noOfAcceptors, self.events, self.database)
+        self.maxDuration = maxSimulationDuration
+        self.proposalNumber = 0
+
+    def load(self, scenario) -> None:
+        # Streams the Events of a scenario.ScenarioFile on top of eventsList as the run gets to them
+        self.events.stream(scenario.events(self.network), len(scenario), scenario.requests(self.network))
+
+    def simulate(self) -> SimulationResult:
+        # Implementation of single-instance verison of Paxos consensus algorithm. 
+        try:
+            return self._simulate()
+        finally:
+            # Whatever is still buffered goes out before the caller prints anything of its own
+            self.network.trace.flush()
+            if self.network.recorder is not None:
+                self.network.recorder.flush()
+
+    def _simulate(self) -> SimulationResult:
+        trace = self.network.trace
+
+        # Step through the ticks that have work to do, skipping idle stretches
+        currentTick = 0
+        while currentTick < self.maxDuration:
+            # If there are no pending messages or events, we can end the simulation
+            if len(self.network) == 0 and len(self.events) == 0 and self.network.nextWakeup() is None:
+                return self._getResult(currentTick, False)
+            
+            trace.log(DEBUG, '{:03}: ', currentTick, end='')
+            self.network.onTick(currentTick)
+            
+            # We will process the event for the current tick
+            currentEvent = self.events.popDue(currentTick) or Event(currentTick, None, None, None, None)
+
+            # For a given tick, only the following can happen:
+            if currentEvent:
+                #   1. A set of machines can fail
+                if currentEvent.failure:
+                    trace.log(DEBUG, '** ', end='')
+                    for failed in currentEvent.failure:
+                        computer = self.network.getComputerById(type(failed), failed.id)
+                        self.network.setFailed(computer, True)
+                        trace.log(DEBUG, '{} ', computer, end='')
+                    trace.log(DEBUG, 'FAILS **', end='')
+
+                #   2. A set of(previously failed) machines can recover
+                if currentEvent.recovery:
+                    trace.log(DEBUG, '** ', end='')
+                    for recovered in currentEvent.recovery:
+                        computer = self.network.getComputerById(type(recovered), recovered.id)
+                        self.network.setFailed(computer, False)
+                        trace.log(DEBUG, '{} ', computer, end='')
+                    trace.log(DEBUG, 'RECOVERS **')
+                    trace.log(DEBUG, '{:03}: ', currentTick, end='')
+
+                #   3. A single message can be delivered. Only, one computer can do any work.
+                busy = set()
+                if currentEvent.request and currentEvent.proposedValue:                
+                    proposer = self.network.getComputerById(Proposers, currentEvent.request.id)
+                    self._propose(proposer, currentEvent.proposedValue)
+                    busy.add(proposer)
+
+                for message in self.network.ExtractMessages(busy):
+                    if busy:
+                        # Every further delivery in the same tick gets its own line
+                        trace.log(DEBUG, '{:03}: ', currentTick, end='')
+                    elif currentEvent.failure:
+                        trace.log(DEBUG, '\n{:03}: ', currentTick, end='')
+                    busy.add(message.destination)
+                    self.network.DeliverMessage(message.destination, message)
+                if not busy:
+                    trace.log(DEBUG, '')
+
+            currentTick = self._getNextTick(currentTick)
+
+        trace.log(INFO, 'Simulation Terminated! Time Over!')
+        return self._getResult(self.maxDuration, True)
+    
+    def _propose(self, proposer: Proposers, value: int) -> None:
+        proposer.setN(self._getGlobalProposalNumber())
+        proposer.setValue(value)
+        message = Propose(src=None, dst=proposer)
+        proposer.saveMessage(message)
+
+        # PROPOSE messages bypass the network and are delivered directly to the specified Proposer
+        self.network.DeliverMessage(proposer, message)
+
+    def _getNextTick(self, tick: int) -> int:
+        # Retries queued during this tick are scheduled relative to the next one
+        self.events.resolveDeferred(tick + 1)
+        if self.network.hasDeliverableMessage():
+            return tick + 1
+        upcoming = [t for t in (self.events.nextTick(), self.network.nextWakeup()) if t is not None]
+        if not upcoming:
+            # Nothing can move until Time Over, unless there is nothing left at all and we can quit
+            return tick + 1 if len(self.network) == 0 else self.maxDuration
+        return max(tick + 1, min(min(upcoming), self.maxDuration))
+
+    def _getGlobalProposalNumber(self) -> int:
+        self.proposalNumber += 1
+        return self.proposalNumber
+
+    def _getResult(self, tick: int, timedOut: bool) -> SimulationResult:
+        consensus = [(proposer.id, proposed, accepted) for proposer, proposed, accepted in self.network.consensusReached]
+        undecided = [proposer.id for proposer in self.network.getComputers(Proposers) if proposer.getValue() and not proposer.hasMajority()]
+        return SimulationResult(consensus, undecided, tick, timedOut)
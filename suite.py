@@ -0,0 +1,214 @@
+import gc
+import io
+import sys
+import json
+import time
+import random
+import argparse
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+from network import Event
+from model import Proposers, Acceptors, MessageType
+from main import Paxos
+from tracing import QUIET
+from config import BENCHMARK_THRESHOLD
+
+# Scenario families: each builds the Events of one run for noOfAcceptors acceptors. Ticks are
+# stretched with the cluster, since a round takes about four deliveries per acceptor.
+
+def noFailures(noOfAcceptors: int) -> List[Event]:
+    # CASE 1: one proposer, nothing fails
+    return [Event(0, None, None, Proposers(1), 42)]
+
+def dueling(noOfAcceptors: int) -> List[Event]:
+    # Two proposers, the second starting while the first is halfway through its PREPAREs
+    return [Event(0, None, None, Proposers(1), 42), Event(noOfAcceptors // 2 + 1, None, None, Proposers(2), 37)]
+
+def proposerFailure(noOfAcceptors: int) -> List[Event]:
+    # CASE 2: P1 fails partway into its round, P2 proposes meanwhile and P1 recovers later
+    scale = max(1, noOfAcceptors // 3)
+    return [Event(0, None, None, Proposers(1), 42), Event(8 * scale, [Proposers(1)], None, None, None),
+            Event(11 * scale, None, None, Proposers(2), 37), Event(26 * scale, None, [Proposers(1)], None, None)]
+
+def acceptorFailures(noOfAcceptors: int) -> List[Event]:
+    # One proposer while a minority of the acceptors fails one after another and recovers
+    events = [Event(0, None, None, Proposers(1), 42)]
+    for id in range(1, noOfAcceptors // 2 + 1):
+        events += [Event(id, [Acceptors(id)], None, None, None), Event(4 * noOfAcceptors + id, None, [Acceptors(id)], None, None)]
+    return events
+
+FAMILIES: Dict[str, Callable[[int], List[Event]]] = {
+    'noFailures': noFailures,
+    'dueling': dueling,
+    'proposerFailure': proposerFailure,
+    'acceptorFailures': acceptorFailures,
+}
+SCALES = (3, 11, 51, 101)
+
+class _Timer:
+    # Wraps a bound method: total seconds spent in it, and how many calls. Part of that is the
+    # wrapper itself, overhead seconds per call (see _timerOverhead), which micros() takes off.
+    def __init__(self, method, overhead: float = 0.0) -> None:
+        self.method = method
+        self.overhead = overhead
+        self.seconds = 0.0
+        self.calls = 0
+
+    def __call__(self, *args):
+        start = time.perf_counter()
+        try:
+            return self.method(*args)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.calls += 1
+
+    def micros(self) -> float:
+        return max(0.0, 1e6 * (self.seconds / self.calls - self.overhead)) if self.calls else 0.0
+
+def _noOp(*args) -> None:
+    return None
+
+def _timerOverhead(calls: int = 20000, repeat: int = 5) -> float:
+    # Seconds per call that a _Timer adds around a method that does nothing, the fastest of repeat tries
+    fastest = None
+    for _ in range(repeat):
+        timer = _Timer(_noOp)
+        for _ in range(calls):
+            timer(None)
+        fastest = timer.seconds if fastest is None else min(fastest, timer.seconds)
+    return fastest / calls
+
+def _paxos(family: str, noOfAcceptors: int, seed: int) -> Paxos:
+    random.seed(seed)
+    paxos = Paxos(2, noOfAcceptors, 30 * noOfAcceptors, FAMILIES[family](noOfAcceptors))
+    paxos.network.trace.level = QUIET
+    return paxos
+
+def _run(paxos: Paxos) -> float:
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        try:
+            paxos.run()
+        except SystemExit:
+            pass
+    return time.perf_counter() - start
+
+def runScenario(family: str, noOfAcceptors: int, seed: int = 0, lookups: int = 100, overhead: float = None) -> Dict:
+    # One whole Paxos.run of the scenario, output and exit() suppressed, then the same run again
+    # timing every call to Network.ExtractMessage and Network.DeliverMessage (the run itself is
+    # timed without them, and the timers' own overhead is taken off), and then lookups of every
+    # acceptor's storage as the run left it
+    if overhead is None:
+        overhead = _timerOverhead()
+    elapsed = _run(_paxos(family, noOfAcceptors, seed))
+    paxos = _paxos(family, noOfAcceptors, seed)
+    network = paxos.network
+    network.ExtractMessage = extract = _Timer(network.ExtractMessage, overhead)
+    network.DeliverMessage = deliver = _Timer(network.DeliverMessage, overhead)
+    _run(paxos)
+    start = time.perf_counter()
+    for acceptor in network.acceptors:
+        for _ in range(lookups):
+            acceptor.getMaxNAndValue(MessageType.PROMISE)
+            acceptor.getLastAccept()
+    storage = time.perf_counter() - start
+    return {
+        'runSeconds': elapsed,
+        'extractMicros': extract.micros(),
+        'deliverMicros': deliver.micros(),
+        'storageMicros': 1e6 * storage / (lookups * noOfAcceptors),
+        # What the run did, which a pure speed-up must leave alone
+        'outcome': {'messages': network.network.queued, 'delivered': deliver.calls, 'consensus': len(network.consensusReached)},
+    }
+
+def _calibrate(size: int = 200000) -> float:
+    # A fixed slice of plain Python work, some 10ms, to tell how fast the machine runs right now
+    start = time.perf_counter()
+    table = {}
+    for number in range(size):
+        table[number % 101] = table.get(number % 101, 0) + number
+    return time.perf_counter() - start
+
+def runSuite(families=tuple(FAMILIES), scales=SCALES, repeat: int = 5, budget: float = 0.2) -> Dict:
+    # Every family at every scale. The suite runs in rounds, every scenario once per round, at
+    # least repeat rounds and until budget seconds per scenario have gone by, with the garbage
+    # collector off as timeit does, and keeps the fastest of every timing. The calibration runs
+    # once per round as well, and its fastest run is what every timing is also kept relative to:
+    # compare() uses those, so results from a faster or slower machine than the baseline's still
+    # compare. Minimums are what stay put from one run of the suite to the next on a busy machine.
+    scenarios = [(family, noOfAcceptors) for family in families for noOfAcceptors in scales]
+    runs = {scenario: [] for scenario in scenarios}
+    calibrations = []
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        overhead = _timerOverhead()
+        start = time.perf_counter()
+        rounds = 0
+        while rounds < repeat or time.perf_counter() - start < budget * len(scenarios):
+            calibrations.append(_calibrate())
+            for scenario in scenarios:
+                runs[scenario].append(runScenario(*scenario, overhead=overhead))
+            rounds += 1
+    finally:
+        if collecting:
+            gc.enable()
+    calibration = min(calibrations)
+    results = {}
+    for (family, noOfAcceptors), scenarioRuns in runs.items():
+        timings = [key for key in scenarioRuns[0] if key != 'outcome']
+        result = {key: min(run[key] for run in scenarioRuns) for key in timings}
+        result['relative'] = {key: result[key] / calibration for key in timings}
+        result['outcome'] = scenarioRuns[0]['outcome']
+        results[f'{family}/{noOfAcceptors}'] = result
+    return results
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float = BENCHMARK_THRESHOLD) -> List[str]:
+    # Every timing more than threshold slower than the baseline's, relative to the calibration
+    # runs, and every outcome that changed
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        if result['outcome'] != baseline[name]['outcome']:
+            regressions.append(f'{name} outcome: {baseline[name]["outcome"]} -> {result["outcome"]}')
+        for key, value in result['relative'].items():
+            before = baseline[name]['relative'].get(key)
+            if before and value > before * (1 + threshold):
+                regressions.append(f'{name} {key}: {result[key]:.6g}, {100 * (value / before - 1):+.0f}% against the calibration')
+    return regressions
+
+def printResults(results: Dict[str, Dict], baseline: Dict[str, Dict] = None) -> None:
+    print(f'{"scenario":>22} {"run ms":>9} {"extract us":>10} {"deliver us":>10} {"storage us":>10} {"messages":>8}')
+    for name, result in results.items():
+        line = f'{name:>22} {1e3 * result["runSeconds"]:>9.3f} {result["extractMicros"]:>10.3f} {result["deliverMicros"]:>10.3f} {result["storageMicros"]:>10.3f} {result["outcome"]["messages"]:>8}'
+        if baseline and name in baseline:
+            line += f'  ({100 * (result["relative"]["runSeconds"] / baseline[name]["relative"]["runSeconds"] - 1):+.0f}% run)'
+        print(line)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the protocol engine on standard scenarios, and compare with a JSON baseline')
+    parser.add_argument('--families', nargs='+', default=list(FAMILIES), choices=list(FAMILIES))
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES), help='numbers of acceptors')
+    parser.add_argument('--repeat', type=int, default=5, help='rounds at least, the fastest run counts')
+    parser.add_argument('--budget', type=float, default=0.2, help='seconds per scenario at least')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--save', help='write the results here as JSON')
+    parser.add_argument('--threshold', type=float, default=BENCHMARK_THRESHOLD, help='slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    results = runSuite(args.families, args.scales, args.repeat, args.budget)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    printResults(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        print(f'{len(regressions)} regressions beyond {args.threshold:.0%}')
+        sys.exit(1 if regressions else 0)
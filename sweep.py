@@ -0,0 +1,88 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from network import Event
+from model import Proposers, Acceptors
+from simulation import SimulationRun, SimulationResult
+from tracing import QUIET
+
+class Scenario(NamedTuple):
+    noOfProposers: int
+    tolerance: int
+    events: List[Event]
+    seed: int
+    maxDuration: int
+
+    @property
+    def noOfAcceptors(self) -> int:
+        # The system requires 2n+1 servers to tolerate the failure of n servers.
+        return 2 * self.tolerance + 1
+
+def randomScenario(noOfProposers: int, tolerance: int, seed: int, noOfFailures: int = 2) -> Scenario:
+    # P1 proposes at tick 0, every other proposer at a random later tick, and noOfFailures
+    # random computers fail and recover. Everything is drawn from Random(seed).
+    rng = Random(seed)
+    noOfAcceptors = 2 * tolerance + 1
+    maxDuration = noOfAcceptors * 30
+    events = [Event(0, None, None, Proposers(1), rng.randrange(1, 100))]
+    for id in range(2, noOfProposers + 1):
+        events.append(Event(rng.randrange(1, maxDuration // 2), None, None, Proposers(id), rng.randrange(1, 100)))
+    for _ in range(noOfFailures):
+        if rng.random() < 0.5:
+            computer = Proposers(rng.randrange(noOfProposers) + 1)
+        else:
+            computer = Acceptors(rng.randrange(noOfAcceptors) + 1)
+        tick = rng.randrange(1, maxDuration // 2)
+        events.append(Event(tick, [computer], None, None, None))
+        events.append(Event(tick + rng.randrange(1, maxDuration // 2), None, [computer], None, None))
+    return Scenario(noOfProposers, tolerance, events, seed, maxDuration)
+
+def runScenario(scenario: Scenario) -> Tuple[Scenario, SimulationResult]:
+    simulation = SimulationRun(scenario.noOfProposers, scenario.noOfAcceptors, scenario.maxDuration, scenario.events, scenario.seed)
+    simulation.network.trace.level = QUIET
+    return scenario, simulation.simulate()
+
+def runSweep(scenarios: Iterable[Scenario], workers: int = None, chunksize: int = 16) -> Iterator[Tuple[Scenario, SimulationResult]]:
+    # Fans the scenarios out over a process pool, one worker per core by default
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        yield from executor.map(runScenario, scenarios, chunksize=chunksize)
+
+def aggregate(results: Iterable[Tuple[Scenario, SimulationResult]]) -> Dict[Tuple[int, int], Dict]:
+    # Summary per (noOfProposers, tolerance): consensus rate, safety violations, timeouts and ticks
+    summary = {}
+    for scenario, result in results:
+        row = summary.setdefault((scenario.noOfProposers, scenario.tolerance), {'runs': 0, 'consensus': 0, 'violations': 0, 'timeouts': 0, 'ticks': []})
+        row['runs'] += 1
+        row['consensus'] += 1 if result.consensusReached else 0
+        row['violations'] += 0 if result.agreement() else 1
+        row['timeouts'] += 1 if result.timedOut else 0
+        row['ticks'].append(result.ticks)
+    for row in summary.values():
+        ticks = sorted(row.pop('ticks'))
+        row['consensusRate'] = row['consensus'] / row['runs']
+        row['meanTicks'] = sum(ticks) / len(ticks)
+        row['medianTicks'] = ticks[len(ticks) // 2]
+        row['maxTicks'] = ticks[-1]
+    return summary
+
+def printSummary(summary: Dict[Tuple[int, int], Dict]) -> None:
+    print(f'{"proposers":>9} {"tolerance":>9} {"runs":>6} {"consensus":>9} {"violations":>10} {"timeouts":>8} {"meanTicks":>9} {"medTicks":>8} {"maxTicks":>8}')
+    for (noOfProposers, tolerance), row in sorted(summary.items()):
+        print(f'{noOfProposers:>9} {tolerance:>9} {row["runs"]:>6} {row["consensusRate"]:>9.1%} {row["violations"]:>10} {row["timeouts"]:>8} {row["meanTicks"]:>9.1f} {row["medianTicks"]:>8} {row["maxTicks"]:>8}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run many independent Paxos simulations across all cores')
+    parser.add_argument('--proposers', type=int, nargs='+', default=[1, 2, 3])
+    parser.add_argument('--tolerance', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--failures', type=int, default=2, help='failure/recovery pairs per scenario')
+    parser.add_argument('--seeds', type=int, default=1000, help='scenarios per configuration')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    scenarios = (randomScenario(noOfProposers, tolerance, seed, args.failures)
+                 for noOfProposers in args.proposers
+                 for tolerance in args.tolerance
+                 for seed in range(args.seeds))
+    printSummary(aggregate(runSweep(scenarios, args.workers)))
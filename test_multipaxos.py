@@ -0,0 +1,32 @@
+from network import Event
+from model import Proposers, Acceptors
+from multipaxos import MultiPaxosRun
+from tracing import QUIET
+
+def _run(events, window=None, maxDuration=2000) -> MultiPaxosRun:
+    run = MultiPaxosRun(2, 3, maxDuration, events, seed=0, window=window)
+    run.network.trace.level = QUIET
+    run.simulate()
+    return run
+
+def _preemptedLeader():
+    # P1 leads, fails with command 1 in flight, P2 takes over and re-proposes it from its promises,
+    # then P1 recovers, is rejected, and forwards command 1 again
+    return [Event(10, None, None, Proposers(1), 1), Event(19, [Proposers(1)], None, None, None),
+            Event(28, None, None, Proposers(2), 6), Event(30, None, None, Proposers(1), 3),
+            Event(33, None, [Proposers(1)], None, None), Event(33, [Acceptors(1)], None, None, None),
+            Event(41, None, None, Proposers(2), 4), Event(43, None, None, Proposers(2), 5),
+            Event(49, None, [Acceptors(1)], None, None), Event(52, None, None, Proposers(2), 2)]
+
+def test_preempted_leader_commands_are_logged_once():
+    for window in (None, 4, 1):
+        run = _run(_preemptedLeader(), window)
+        log = run.network.getLog()
+        assert sorted(log) == [1, 2, 3, 4, 5, 6], (window, log)
+        assert not run.network.conflicts
+
+def test_follower_stops_following_a_failed_leader():
+    events = [Event(0, None, None, Proposers(1), 1), Event(2, None, None, Proposers(2), 2), Event(60, [Proposers(2)], None, None, None)]
+    events += [Event(70 + i, None, None, Proposers(1), 100 + i) for i in range(10)]
+    run = _run(events)
+    assert sorted(run.network.getLog()) == [1, 2] + list(range(100, 110))
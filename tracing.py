@@ -0,0 +1,43 @@
+import sys
+from typing import List, TextIO
+from config import TRACE_LEVEL, TRACE_BUFFER
+
+# Trace levels, least to most verbose. A sink at level L emits every record at L or below.
+#   QUIET: nothing at all
+#   ERROR: exceptions raised while delivering a message
+#   INFO:  how a run ended
+#   DEBUG: the tick-by-tick trace: failures, recoveries and every message delivered
+QUIET, ERROR, INFO, DEBUG = 0, 1, 2, 3
+
+class Trace:
+    # Sink for a run's trace output, attached as network.trace. A record is a format string and
+    # its arguments; both are dropped untouched unless the record's level is enabled, so a quiet
+    # sink never calls __str__ on a message. Enabled records are formatted as they are logged
+    # (messages print live state, which will have moved on by the time the buffer is written) and
+    # the text is buffered until about bufferSize characters have piled up, then written in one go.
+    # file=None writes to whatever sys.stdout is when the buffer is flushed.
+    def __init__(self, level: int = TRACE_LEVEL, file: TextIO = None, bufferSize: int = TRACE_BUFFER) -> None:
+        self.level = level
+        self.file = file
+        self.bufferSize = bufferSize
+        self.buffer: List[str] = []
+        self.buffered = 0
+
+    def enabled(self, level: int) -> bool:
+        return level <= self.level
+
+    def log(self, level: int, format: str, *args, end: str = '\n') -> None:
+        if level > self.level:
+            return
+        text = (format.format(*args) if args else format) + end
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.bufferSize:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            file = self.file if self.file is not None else sys.stdout
+            file.write(''.join(self.buffer))
+            self.buffer.clear()
+            self.buffered = 0
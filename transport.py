@@ -0,0 +1,190 @@
+import time
+import struct
+import asyncio
+import argparse
+from typing import Dict, List, Tuple
+from network import Network, Peer, SAVED_BY_SENDER
+from model import Computers, Proposers, Acceptors, Message, MessageType, Propose, Prepare, Promise, Accept, Accepted, Rejected, DataBase, checkIntValue
+from scheduler import EventScheduler
+from tracing import Trace, QUIET
+from config import NO_OF_PROPOSERS, NO_OF_ACCEPTORS
+
+# Wire frame: type, source kind and id, destination kind and id, and the sender's n and value.
+# Kinds are 0 for a Proposer and 1 for an Acceptor; a missing n or value is sent as NONE.
+FRAME = struct.Struct('!BBHBHqq')
+NONE = -2 ** 63
+MESSAGES = {MessageType.PREPARE: Prepare, MessageType.PROMISE: Promise, MessageType.ACCEPT: Accept,
+            MessageType.ACCEPTED: Accepted, MessageType.REJECTED: Rejected}
+
+def _kind(computer: Computers) -> int:
+    return 0 if isinstance(computer, Proposers) else 1
+
+def encodeMessage(message: Message) -> bytes:
+    source, destination = message.source, message.destination
+    n = source.getN() if source.getN() is not None else NONE
+    value = source.getValue() if source.getValue() is not None else NONE
+    return FRAME.pack(message.type.value, _kind(source), source.id, _kind(destination), destination.id, n, value)
+
+def decodeFrame(frame: bytes) -> Tuple[MessageType, int, int, int, int, int, int]:
+    messageType, srcKind, srcId, dstKind, dstId, n, value = FRAME.unpack(frame)
+    return MessageType(messageType), srcKind, srcId, dstKind, dstId, None if n == NONE else n, None if value == NONE else value
+
+class AsyncNetwork(Network):
+    # Runs the single-synod protocol over real loopback TCP connections instead of the tick queue.
+    # Every computer listens on its own 127.0.0.1 port and works through its inbox in its own
+    # asyncio task, one message at a time. QueueMessage encodes the message into a fixed-size
+    # binary frame and buffers it per destination; all frames queued for a destination in one
+    # event-loop iteration are written in a single call over a connection that stays open.
+    # A received frame is all its receiver learns: the message's source is a Peer rebuilt from
+    # it, and only failures (injected from outside) are looked up on the sender's own object.
+    def __init__(self, noOfProposers: int, noOfAcceptors: int, events: EventScheduler = None, database: DataBase = None) -> None:
+        super().__init__(noOfProposers, noOfAcceptors, events, database)
+        # No trace by default: log lines would be built while the clock is running
+        self.trace = Trace(QUIET)
+        self.proposalNumber = 0
+        self.ports: Dict[Computers, int] = {}
+        self.inboxes: Dict[Computers, asyncio.Queue] = {}
+        self.servers: List[asyncio.AbstractServer] = []
+        self.tasks: List[asyncio.Task] = []
+        # One connection to every computer, shared by all the senders in this process
+        self.writers: Dict[Computers, asyncio.StreamWriter] = {}
+        self.outbox: Dict[Computers, bytearray] = {}
+        self.flushScheduled = False
+        # Messages that arrived while their source or destination was failed
+        self.parked: List[Message] = []
+        self.consensusChanged: asyncio.Event = None
+        self.framesSent = self.writes = 0
+
+    def __len__(self) -> int:
+        return sum(inbox.qsize() for inbox in self.inboxes.values()) + sum(len(data) for data in self.outbox.values()) // FRAME.size
+
+    async def start(self) -> None:
+        self.consensusChanged = asyncio.Event()
+        for computer in self.getComputers():
+            self.inboxes[computer] = asyncio.Queue()
+            server = await asyncio.start_server(lambda reader, writer: self._receive(reader), '127.0.0.1', 0)
+            self.ports[computer] = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+            self.tasks.append(asyncio.ensure_future(self._work(computer)))
+        for computer in self.getComputers():
+            _, self.writers[computer] = await asyncio.open_connection('127.0.0.1', self.ports[computer])
+
+    async def stop(self) -> None:
+        self.trace.flush()
+        for task in self.tasks:
+            task.cancel()
+        for writer in self.writers.values():
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+    def QueueMessage(self, message: Message) -> None:
+        if isinstance(message.destination, Peer):
+            # A reply: addressed by the id the request came from
+            message.destination = self._local(message.destination)
+        if message.type in SAVED_BY_SENDER:
+            message.source.saveMessage(message)
+        self.outbox.setdefault(message.destination, bytearray()).extend(encodeMessage(message))
+        self.framesSent += 1
+        if not self.flushScheduled:
+            self.flushScheduled = True
+            asyncio.get_event_loop().call_soon(self._flush)
+
+    def ExtractMessage(self) -> Message:
+        # Messages are pushed to their destination as they arrive; there is no queue to pull from
+        return None
+
+    def setFailed(self, computer: Computers, failed: bool) -> None:
+        if computer.failed == failed:
+            return
+        super().setFailed(computer, failed)
+        if not failed:
+            parked, self.parked = self.parked, []
+            for message in parked:
+                self._accept(message)
+
+    def _flush(self) -> None:
+        # Runs once the event-loop iteration that queued the frames is through
+        self.flushScheduled = False
+        outbox, self.outbox = self.outbox, {}
+        for destination, data in outbox.items():
+            self.writers[destination].write(bytes(data))
+            self.writes += 1
+
+    async def _receive(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                messageType, srcKind, srcId, dstKind, dstId, n, value = decodeFrame(await reader.readexactly(FRAME.size))
+                destination = self.getComputerById(Proposers if dstKind == 0 else Acceptors, dstId)
+                self._accept(MESSAGES[messageType](Peer(srcKind, srcId, n, value), destination))
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            # The sending side closed the connection
+            return
+
+    def _accept(self, message: Message) -> None:
+        if self._local(message.source).failed or message.destination.failed:
+            self.parked.append(message)
+        else:
+            self.inboxes[message.destination].put_nowait(message)
+
+    async def _work(self, computer: Computers) -> None:
+        inbox = self.inboxes[computer]
+        while True:
+            message = await inbox.get()
+            if computer.failed:
+                self.parked.append(message)
+                continue
+            reached = len(self.consensusReached)
+            self.DeliverMessage(computer, message)
+            if len(self.consensusReached) != reached:
+                self.consensusChanged.set()
+
+    async def propose(self, proposer: Proposers, value: int, timeout: float = 5.0) -> Tuple[Proposers, int, int]:
+        # Starts a new round at proposer and waits until it reaches consensus
+        checkIntValue(value, 'The TCP transport')
+        self.proposalNumber += 1
+        proposer.setN(self.proposalNumber)
+        proposer.setValue(value)
+        message = Propose(src=None, dst=proposer)
+        proposer.saveMessage(message)
+        reached = len(self.consensusReached)
+        # PROPOSE messages bypass the network and are delivered directly to the specified Proposer
+        self.DeliverMessage(proposer, message)
+        deadline = time.perf_counter() + timeout
+        while not any(entry[0] is proposer for entry in self.consensusReached[reached:]):
+            self.consensusChanged.clear()
+            await asyncio.wait_for(self.consensusChanged.wait(), max(deadline - time.perf_counter(), 0))
+        return next(entry for entry in self.consensusReached[reached:] if entry[0] is proposer)
+
+async def measureLatency(noOfRounds: int, noOfProposers: int, noOfAcceptors: int) -> List[float]:
+    # Wall-clock commit latency of noOfRounds consecutive single-synod rounds, round-robin over proposers
+    network = AsyncNetwork(noOfProposers, noOfAcceptors)
+    await network.start()
+    latencies = []
+    try:
+        for round in range(noOfRounds):
+            proposer = network.proposers[round % noOfProposers]
+            start = time.perf_counter()
+            await network.propose(proposer, round + 1)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await network.stop()
+    print(f'{network.framesSent} frames in {network.writes} writes over {len(network.writers)} connections')
+    return latencies
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Single-synod Paxos over loopback TCP')
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--proposers', type=int, default=NO_OF_PROPOSERS)
+    parser.add_argument('--acceptors', type=int, default=NO_OF_ACCEPTORS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    latencies = sorted(asyncio.run(measureLatency(args.rounds, args.proposers, args.acceptors)))
+    elapsed = time.perf_counter() - start
+    percentile = lambda p: 1e3 * latencies[min(int(p * len(latencies)), len(latencies) - 1)]
+    print(f'{len(latencies)} commits in {elapsed:.3f}s: {len(latencies) / elapsed:.0f} commits/s, '
+          f'latency p50 {percentile(0.5):.3f}ms p99 {percentile(0.99):.3f}ms max {1e3 * latencies[-1]:.3f}ms')